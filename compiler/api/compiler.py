@@ -22,6 +22,7 @@ import re
 import shutil
 from functools import partial
 from pathlib import Path
+from struct import calcsize
 from typing import NamedTuple, List, Tuple
 
 # from autoflake import fix_code
@@ -42,6 +43,26 @@ INT_RE = re.compile(r"int(\d+)")
 
 CORE_TYPES = ["int", "long", "int128", "int256", "double", "bytes", "string", "Bool", "true"]
 
+# Fixed-width types that can be packed together with struct, flags (#) and constructor IDs included
+FIXED_TYPES = {"int": "i", "long": "q", "double": "d", "#": "i", "ID": "I"}
+
+# Runs of fixed-width fields are read and written with a single struct call. Disabled, every field goes through its
+# own primitive (see tests/raw/benchmark_structs.py)
+FUSE_FIXED_FIELDS = True
+
+# Sizes of the core types that can be skipped by just moving the cursor
+SKIP_SIZES = {"int": 4, "long": 8, "double": 8, "#": 4, "int128": 16, "int256": 32, "Bool": 4}
+
+# Vectors of these (usually large) types are decoded on first access when lazy decoding is enabled
+LAZY_TYPES = ["User", "Chat", "Message"]
+
+# Values repeated across many updates which can share a single copy when interning is enabled
+INTERNED_TYPES = ["PeerUser", "PeerChat", "PeerChannel", "ReactionEmoji"]
+INTERNED_FIELDS = ["username", "first_name", "last_name", "title", "lang_code", "emoticon", "mime_type"]
+
+# Schema types parsed manually in raw.core, still exposed under their names in raw.base and raw.types
+CORE_OBJECTS = ["RpcResult"]
+
 WARNING = """
 # # # # # # # # # # # # # # # # # # # # # # # #
 #               !!! WARNING !!!               #
@@ -134,6 +155,99 @@ def get_type_hint(type: str) -> str:
         return f'{type}{" = None" if is_flag else ""}'
 
 
+def get_write_core(type: str, value: str) -> str:
+    # Variable-length primitives are appended in place, fixed-size ones are small enough to be concatenated
+    if type in ["bytes", "string"]:
+        return f"{type.title()}.write_to(b, {value})"
+
+    return f"b += {type.title()}({value})"
+
+
+def get_struct(fmt: str, structs: dict) -> str:
+    name = f"STRUCT_{fmt}"
+    structs[name] = f'{name} = Struct("<{fmt}")'
+
+    return name
+
+
+def get_read_run(run: List[Tuple[str, str]], structs: dict) -> List[str]:
+    if not run:
+        return []
+
+    if len(run) == 1 or not FUSE_FIXED_FIELDS:
+        return [f"{name} = {'Int' if type == '#' else type.title()}.read(b)" for name, type in run]
+
+    fmt = "".join(FIXED_TYPES[t] for _, t in run)
+
+    return [f"{', '.join(n for n, _ in run)} = {get_struct(fmt, structs)}.unpack(b.read({calcsize('<' + fmt)}))"]
+
+
+def get_write_run(run: List[Tuple[str, str]], structs: dict) -> List[str]:
+    if not run:
+        return []
+
+    if len(run) == 1 or not FUSE_FIXED_FIELDS:
+        return [
+            f"b += Int({value}, False)" if type == "ID"
+            else f"b += Int({value})" if type == "#"
+            else get_write_core(type, value)
+            for value, type in run
+        ]
+
+    fmt = "".join(FIXED_TYPES[t] for _, t in run)
+
+    return [f"b += {get_struct(fmt, structs)}.pack({', '.join(v for v, _ in run)})"]
+
+
+def get_read_core(type: str, name: str) -> str:
+    if type == "string" and name in INTERNED_FIELDS:
+        return "Intern.string(String.read(b))"
+
+    return f"{type.title()}.read(b)"
+
+
+def get_skip_core(type: str) -> str:
+    return f"b.seek({SKIP_SIZES[type]}, 1)" if type in SKIP_SIZES else "Bytes.skip(b)"
+
+
+def get_vector_reader(sub_type: str) -> str:
+    return "LazyList" if sub_type in LAZY_TYPES else "TLObject"
+
+
+def get_to_dict(type: str, value: str) -> str:
+    if type in CORE_TYPES:
+        return value
+
+    if type.lower().startswith("vector"):
+        sub_type = type.split("<")[1][:-1]
+        return value if sub_type in CORE_TYPES else f"[i.to_dict() for i in {value}]"
+
+    return f"{value}.to_dict()"
+
+
+def get_from_dict(type: str, value: str) -> str:
+    if type == "bytes":
+        return f"Bytes.from_value({value})"
+
+    if type in CORE_TYPES:
+        return value
+
+    if type.lower().startswith("vector"):
+        sub_type = type.split("<")[1][:-1]
+
+        if sub_type in CORE_TYPES:
+            return f"[{get_from_dict(sub_type, 'i')} for i in {value}]" if sub_type == "bytes" else value
+
+        return f"[TLObject.from_dict(i) for i in {value}]"
+
+    return f"TLObject.from_dict({value})"
+
+
+def get_vector_type(sub_type: str) -> str:
+    # Always pass the element type, so that Vector.read never has to guess it from the remaining bytes
+    return sub_type.title() if sub_type in CORE_TYPES else "TLObject"
+
+
 def sort_args(args):
     """Put flags at the end"""
     args = args.copy()
@@ -211,9 +325,11 @@ def start(format: bool = False):
         schema = (f1.read() + f2.read() + f3.read()).splitlines()
 
     with open(HOME_PATH / "template/type.txt") as f1, \
-        open(HOME_PATH / "template/combinator.txt") as f2:
+        open(HOME_PATH / "template/combinator.txt") as f2, \
+        open(HOME_PATH / "template/namespace.txt") as f3:
         type_tmpl = f1.read()
         combinator_tmpl = f2.read()
+        namespace_tmpl = f3.read()
 
     with open(NOTICE_PATH, encoding="utf-8") as f:
         notice = []
@@ -445,13 +561,25 @@ def start(format: bool = False):
                              f"            :nosignatures:\n\n" \
                              f"            " + references
 
-        write_types = read_types = "" if c.has_flags else "# No flags\n        "
+        structs = {}
+        read_lines = [] if c.has_flags else ["# No flags"]
+        write_lines = []
+        # Flags are read together with the fields around them, so true flags can only be derived at the end
+        read_true_flags = []
+
+        # Runs of consecutive fixed-width fields, starting with the constructor ID when writing
+        read_run = []
+        write_run = [("self.ID", "ID")]
+
+        # Skipping only needs the flags and the variable-length fields, everything else is a single seek
+        skip_lines = []
+        skip_size = 0
 
         for arg_name, arg_type in c.args:
             flag = FLAGS_RE_2.match(arg_type)
 
             if re.match(r"flags\d?", arg_name) and arg_type == "#":
-                write_flags = []
+                write_flags = [f"{arg_name} = 0"]
 
                 for i in c.args:
                     flag = FLAGS_RE_2.match(i[1])
@@ -466,78 +594,173 @@ def start(format: bool = False):
                             write_flags.append(
                                 f"{arg_name} |= (1 << {flag.group(2)}) if self.{i[0]} is not None else 0")
 
-                write_flags = "\n        ".join([
-                    f"{arg_name} = 0",
-                    "\n        ".join(write_flags),
-                    f"b.write(Int({arg_name}))\n        "
-                ])
+                # The flags must be computed before the run they belong to is written
+                write_lines.append("\n        ".join(write_flags))
+
+                read_run.append((arg_name, arg_type))
+                write_run.append((arg_name, arg_type))
+
+                if skip_size:
+                    skip_lines.append(f"b.seek({skip_size}, 1)")
+                    skip_size = 0
 
-                write_types += write_flags
-                read_types += f"\n        {arg_name} = Int.read(b)\n        "
+                skip_lines.append(f"{arg_name} = Int.read(b)")
 
                 continue
 
+            if not flag and arg_type in FIXED_TYPES:
+                read_run.append((arg_name, arg_type))
+                write_run.append((f"self.{arg_name}", arg_type))
+                skip_size += SKIP_SIZES[arg_type]
+
+                continue
+
+            if flag and flag.group(3) == "true":
+                number, index, _ = flag.groups()
+                read_true_flags.append(f"{arg_name} = True if flags{number} & (1 << {index}) else False")
+
+                continue
+
+            read_lines.extend(get_read_run(read_run, structs))
+            write_lines.extend(get_write_run(write_run, structs))
+            read_run.clear()
+            write_run.clear()
+
+            if not flag and arg_type in SKIP_SIZES:
+                skip_size += SKIP_SIZES[arg_type]
+            elif skip_size:
+                skip_lines.append(f"b.seek({skip_size}, 1)")
+                skip_size = 0
+
             if flag:
                 number, index, flag_type = flag.groups()
 
-                if flag_type == "true":
-                    read_types += "\n        "
-                    read_types += f"{arg_name} = True if flags{number} & (1 << {index}) else False"
-                elif flag_type in CORE_TYPES:
-                    write_types += "\n        "
-                    write_types += f"if self.{arg_name} is not None:\n            "
-                    write_types += f"b.write({flag_type.title()}(self.{arg_name}))\n        "
-
-                    read_types += "\n        "
-                    read_types += f"{arg_name} = {flag_type.title()}.read(b) if flags{number} & (1 << {index}) else None"
+                if flag_type in CORE_TYPES:
+                    write_lines.append(
+                        f"if self.{arg_name} is not None:\n            "
+                        f"{get_write_core(flag_type, f'self.{arg_name}')}"
+                    )
+                    read_lines.append(
+                        f"{arg_name} = {get_read_core(flag_type, arg_name)} if flags{number} & (1 << {index}) else None"
+                    )
+                    skip_lines.append(f"if flags{number} & (1 << {index}):\n            {get_skip_core(flag_type)}")
                 elif "vector" in flag_type.lower():
                     sub_type = arg_type.split("<")[1][:-1]
 
-                    write_types += "\n        "
-                    write_types += f"if self.{arg_name} is not None:\n            "
-                    write_types += "b.write(Vector(self.{}{}))\n        ".format(
-                        arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else ""
+                    # Must agree with the flag bit, which is only set for non-empty vectors
+                    write_lines.append(
+                        "if self.{0}:\n            Vector.write_to(b, self.{0}{1})".format(
+                            arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else ""
+                        )
                     )
-
-                    read_types += "\n        "
-                    read_types += "{} = TLObject.read(b{}) if flags{} & (1 << {}) else []\n        ".format(
-                        arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else "", number, index
+                    read_lines.append(
+                        "{} = {}.read(b, {}) if flags{} & (1 << {}) else []".format(
+                            arg_name, get_vector_reader(sub_type), get_vector_type(sub_type), number, index
+                        )
+                    )
+                    skip_lines.append(
+                        f"if flags{number} & (1 << {index}):\n            "
+                        f"TLObject.skip(b, {get_vector_type(sub_type)})"
                     )
                 else:
-                    write_types += "\n        "
-                    write_types += f"if self.{arg_name} is not None:\n            "
-                    write_types += f"b.write(self.{arg_name}.write())\n        "
-
-                    read_types += "\n        "
-                    read_types += f"{arg_name} = TLObject.read(b) if flags{number} & (1 << {index}) else None\n        "
+                    write_lines.append(f"if self.{arg_name} is not None:\n            self.{arg_name}.write_to(b)")
+                    read_lines.append(f"{arg_name} = TLObject.read(b) if flags{number} & (1 << {index}) else None")
+                    skip_lines.append(f"if flags{number} & (1 << {index}):\n            TLObject.skip(b)")
             else:
                 if arg_type in CORE_TYPES:
-                    write_types += "\n        "
-                    write_types += f"b.write({arg_type.title()}(self.{arg_name}))\n        "
+                    write_lines.append(get_write_core(arg_type, f"self.{arg_name}"))
+                    read_lines.append(f"{arg_name} = {get_read_core(arg_type, arg_name)}")
 
-                    read_types += "\n        "
-                    read_types += f"{arg_name} = {arg_type.title()}.read(b)\n        "
+                    if arg_type not in SKIP_SIZES:
+                        skip_lines.append(get_skip_core(arg_type))
                 elif "vector" in arg_type.lower():
                     sub_type = arg_type.split("<")[1][:-1]
 
-                    write_types += "\n        "
-                    write_types += "b.write(Vector(self.{}{}))\n        ".format(
-                        arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else ""
+                    write_lines.append(
+                        "Vector.write_to(b, self.{}{})".format(
+                            arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else ""
+                        )
                     )
-
-                    read_types += "\n        "
-                    read_types += "{} = TLObject.read(b{})\n        ".format(
-                        arg_name, f", {sub_type.title()}" if sub_type in CORE_TYPES else ""
+                    read_lines.append(
+                        f"{arg_name} = {get_vector_reader(sub_type)}.read(b, {get_vector_type(sub_type)})"
                     )
+                    skip_lines.append(f"TLObject.skip(b, {get_vector_type(sub_type)})")
+                else:
+                    write_lines.append(f"self.{arg_name}.write_to(b)")
+                    read_lines.append(f"{arg_name} = TLObject.read(b)")
+                    skip_lines.append("TLObject.skip(b)")
+
+        read_lines.extend(get_read_run(read_run, structs))
+        write_lines.extend(get_write_run(write_run, structs))
+        read_lines.extend(read_true_flags)
+
+        if skip_size:
+            skip_lines.append(f"b.seek({skip_size}, 1)")
+
+        read_types = "\n\n        ".join(read_lines)
+        write_types = "\n\n        ".join(write_lines)
+        skip_types = "\n\n        ".join(skip_lines) or "pass"
+
+        read_result = ""
+
+        if c.section == "functions":
+            if c.qualtype.lower().startswith("vector"):
+                read_result = (
+                    "\n    def read_result(self, b: BytesIO, *args: Any) -> List[Any]:\n"
+                    f"        return TLObject.read(b, {get_vector_type(c.qualtype.split('<')[1][:-1])})\n"
+                )
+            elif c.qualtype == "X":
+                # Wrapper functions return whatever the wrapped query returns
+                read_result = (
+                    "\n    def read_result(self, b: BytesIO, *args: Any) -> Any:\n"
+                    "        return self.query.read_result(b)\n"
+                )
+
+        # Required arguments come first, so the dicts keep the slots order while leaving out the unset flags
+        to_dict_items = [f'"_": "{c.section}.{c.qualname}"']
+        to_dict_lines = []
+        from_dict_args = []
+
+        for arg_name, arg_type in sorted_args:
+            flag = FLAGS_RE_2.match(arg_type)
+            item = f'd["{arg_name}"]'
+
+            if not flag:
+                to_dict_items.append(f'"{arg_name}": {get_to_dict(arg_type, f"self.{arg_name}")}')
+                from_dict_args.append(f'{arg_name}={get_from_dict(arg_type, item)}')
+            elif flag.group(3) == "true":
+                if to_dict_lines:
+                    to_dict_lines.append(f'd["{arg_name}"] = self.{arg_name}')
                 else:
-                    write_types += "\n        "
-                    write_types += f"b.write(self.{arg_name}.write())\n        "
+                    to_dict_items.append(f'"{arg_name}": self.{arg_name}')
+                from_dict_args.append(f'{arg_name}=d.get("{arg_name}", False)')
+            else:
+                flag_type = flag.group(3)
+                is_vector = flag_type.lower().startswith("vector")
 
-                    read_types += "\n        "
-                    read_types += f"{arg_name} = TLObject.read(b)\n        "
+                to_dict_lines.append(
+                    f"if self.{arg_name} is not None:\n            "
+                    f'd["{arg_name}"] = {get_to_dict(flag_type, f"self.{arg_name}")}'
+                )
+                from_dict_args.append(
+                    f'{arg_name}={get_from_dict(flag_type, item)} '
+                    f'if "{arg_name}" in d else {"[]" if is_vector else "None"}'
+                )
+
+        if to_dict_lines:
+            to_dict_types = "\n\n        ".join(
+                [f"d = {{{', '.join(to_dict_items)}}}"] + to_dict_lines + ["return d"]
+            )
+        else:
+            to_dict_types = f"return {{{', '.join(to_dict_items)}}}"
+        from_dict_arguments = ", ".join(from_dict_args)
 
         slots = ", ".join([f'"{i[0]}"' for i in sorted_args])
         return_arguments = ", ".join([f"{i[0]}={i[0]}" for i in sorted_args])
+        read_return = f"{c.name}({return_arguments})"
+
+        if c.section == "types" and c.name in INTERNED_TYPES:
+            read_return = f"Intern.object({read_return})"
 
         compiled_combinator = combinator_tmpl.format(
             notice=notice,
@@ -550,8 +773,13 @@ def start(format: bool = False):
             arguments=arguments,
             fields=fields,
             read_types=read_types,
+            read_result=read_result,
+            skip_types=skip_types,
+            to_dict_types=to_dict_types,
+            from_dict_arguments=from_dict_arguments,
+            structs="\n" + "\n".join(sorted(structs.values())) + "\n" if structs else "",
             write_types=write_types,
-            return_arguments=return_arguments
+            read_return=read_return
         )
 
         directory = "types" if c.section == "types" else c.section
@@ -575,53 +803,33 @@ def start(format: bool = False):
 
         d[c.namespace].append(c.name)
 
-    for namespace, types in namespaces_to_types.items():
-        with open(DESTINATION_PATH / "base" / namespace / "__init__.py", "w") as f:
-            f.write(f"{notice}\n\n")
-            f.write(f"{WARNING}\n\n")
-
-            for t in types:
-                module = t
-
-                if module == "Updates":
-                    module = "UpdatesT"
-
-                f.write(f"from .{snake(module)} import {t}\n")
-
-            if not namespace:
-                f.write(f"from . import {', '.join(filter(bool, namespaces_to_types))}")
-
-    for namespace, types in namespaces_to_constructors.items():
-        with open(DESTINATION_PATH / "types" / namespace / "__init__.py", "w") as f:
-            f.write(f"{notice}\n\n")
-            f.write(f"{WARNING}\n\n")
-
-            for t in types:
-                module = t
-
-                if module == "Updates":
-                    module = "UpdatesT"
-
-                f.write(f"from .{snake(module)} import {t}\n")
-
-            if not namespace:
-                f.write(f"from . import {', '.join(filter(bool, namespaces_to_constructors))}\n")
-
-    for namespace, types in namespaces_to_functions.items():
-        with open(DESTINATION_PATH / "functions" / namespace / "__init__.py", "w") as f:
-            f.write(f"{notice}\n\n")
-            f.write(f"{WARNING}\n\n")
-
-            for t in types:
-                module = t
-
-                if module == "Updates":
-                    module = "UpdatesT"
-
-                f.write(f"from .{snake(module)} import {t}\n")
-
-            if not namespace:
-                f.write(f"from . import {', '.join(filter(bool, namespaces_to_functions))}")
+    for directory, namespaces in [
+        ("base", namespaces_to_types),
+        ("types", namespaces_to_constructors),
+        ("functions", namespaces_to_functions)
+    ]:
+        for namespace, types in namespaces.items():
+            modules = {t: f".{snake('UpdatesT' if t == 'Updates' else t)}" for t in types}
+            sub_namespaces = [] if namespace else sorted(filter(bool, namespaces))
+
+            if directory != "functions" and not namespace:
+                modules.update({t: "pyrogram.raw.core" for t in CORE_OBJECTS})
+
+            imports = [f"from {m} import {t}" for t, m in modules.items()]
+
+            if sub_namespaces:
+                imports.append(f"from . import {', '.join(sub_namespaces)}")
+
+            with open(DESTINATION_PATH / directory / namespace / "__init__.py", "w") as f:
+                f.write(
+                    namespace_tmpl.format(
+                        notice=notice,
+                        warning=WARNING,
+                        imports="\n    ".join(imports),
+                        objects=",\n    ".join(f'"{t}": "{m}"' for t, m in modules.items()),
+                        namespaces=", ".join(f'"{n}"' for n in sub_namespaces)
+                    )
+                )
 
     with open(DESTINATION_PATH / "all.py", "w", encoding="utf-8") as f:
         f.write(notice + "\n\n")
@@ -640,6 +848,7 @@ def start(format: bool = False):
         f.write('\n    0x0949d9dc: "pyrogram.raw.core.FutureSalt",')
         f.write('\n    0x3072cfa1: "pyrogram.raw.core.GzipPacked",')
         f.write('\n    0x5bb8e511: "pyrogram.raw.core.Message",')
+        f.write('\n    0xf35c6d01: "pyrogram.raw.core.RpcResult",')
 
         f.write("\n}\n")
 
@@ -142,7 +142,9 @@ def pyrogram_api():
             add_handler
             remove_handler
             stop_transmission
+            wait_for
             export_session_string
+            get_metrics
             set_parse_mode
         """,
         messages="""
@@ -38,5 +38,6 @@ class ContinuePropagation(StopAsyncIteration):
 from . import raw, types, filters, handlers, emoji, enums
 from .client import Client
 from .sync import idle, compose
+from .process_executor import run_in_process
 
 crypto_executor = ThreadPoolExecutor(1, thread_name_prefix="CryptoWorker")
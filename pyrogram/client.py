@@ -25,6 +25,8 @@ import platform
 import re
 import shutil
 import sys
+import time
+from concurrent.futures.process import ProcessPoolExecutor
 from concurrent.futures.thread import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from hashlib import sha256
@@ -32,11 +34,12 @@ from importlib import import_module
 from io import StringIO, BytesIO
 from mimetypes import MimeTypes
 from pathlib import Path
-from typing import Union, List, Optional, Callable, AsyncGenerator
+from typing import Union, List, Optional, Callable, AsyncGenerator, Dict
 
 import pyrogram
 from pyrogram import __version__, __license__
 from pyrogram import enums
+from pyrogram import metrics
 from pyrogram import raw
 from pyrogram import utils
 from pyrogram.crypto import aes
@@ -57,6 +60,7 @@ from .file_id import FileId, FileType, ThumbnailSource
 from .mime_types import mime_types
 from .parser import Parser
 from .session.internals import MsgId
+from .update_state import UpdateState
 
 log = logging.getLogger(__name__)
 
@@ -137,6 +141,47 @@ class Client(Methods):
             Number of maximum concurrent workers for handling incoming updates.
             Defaults to ``min(32, os.cpu_count() + 4)``.
 
+        process_workers (``int``, *optional*):
+            Number of processes handler callbacks marked with :meth:`~pyrogram.run_in_process` are executed in.
+            The process pool is only started once such a callback is called for the first time.
+            Defaults to ``os.cpu_count()``.
+
+        shards (``int``, *optional*):
+            Number of queues incoming updates are distributed onto by chat, each one consumed by a single worker.
+            Updates coming from the same chat are always handled in order, while different chats are handled in
+            parallel and a slow chat can only hold back the chats sharing its queue. Takes the place of *workers*.
+            Defaults to None (a single queue shared by all workers, updates may be handled out of order).
+
+        fan_out (``int``, *optional*):
+            Number of worker processes to hand incoming updates over to. This client keeps the only connection to
+            Telegram, while handlers are executed by the worker processes, each one with its own *workers* (and
+            *shards*). Updates of the same chat always go to the same process and queries invoked by handlers are
+            forwarded back to this client. Handlers must be registered before starting, file transfers are not
+            available to handlers and the processes are forked, hence this requires a platform supporting fork.
+            Defaults to None (handlers are executed by this process).
+
+        max_queue_size (``int``, *optional*):
+            Maximum amount of updates waiting to be handled (per shard, in case *shards* is set). Once reached, what
+            happens to incoming updates depends on *queue_policies*. Updates waiting for room are held in memory
+            outside the queue, since receiving can't be paused without holding back query responses as well.
+            Defaults to None (no limit).
+
+        queue_policies (``dict``, *optional*):
+            Policies applied once the updates queue is full, as dict of raw update type to
+            :obj:`~pyrogram.enums.QueuePolicy`, e.g.: *{raw.types.UpdateUserStatus: enums.QueuePolicy.DROP_OLDEST}*.
+            User statuses and deleted messages are coalesced unless specified otherwise, any other update blocks until
+            there's room in the queue.
+
+        slow_handler_threshold (``float``, *optional*):
+            Seconds a handler can take before a warning is logged about it. Timings of all handlers are available
+            anyway through *dispatcher.handler_stats*.
+            Defaults to None (no warnings).
+
+        handler_timeout (``float``, *optional*):
+            Seconds handlers with an async callback are allowed to run for, after which they are cancelled. A handler's
+            own *timeout* attribute takes precedence. Callbacks running in threads can't be cancelled.
+            Defaults to None (no timeout).
+
         workdir (``str``, *optional*):
             Define a custom working directory.
             The working directory is the location in the filesystem where Pyrogram will store the session files.
@@ -218,6 +263,13 @@ class Client(Methods):
         phone_code: str = None,
         password: str = None,
         workers: int = WORKERS,
+        process_workers: int = None,
+        shards: int = None,
+        fan_out: int = None,
+        max_queue_size: int = None,
+        queue_policies: Dict[type, "enums.QueuePolicy"] = None,
+        slow_handler_threshold: float = None,
+        handler_timeout: float = None,
         workdir: str = WORKDIR,
         plugins: dict = None,
         parse_mode: "enums.ParseMode" = enums.ParseMode.DEFAULT,
@@ -246,6 +298,13 @@ class Client(Methods):
         self.phone_code = phone_code
         self.password = password
         self.workers = workers
+        self.process_workers = process_workers
+        self.shards = shards
+        self.fan_out = fan_out
+        self.max_queue_size = max_queue_size
+        self.queue_policies = queue_policies
+        self.slow_handler_threshold = slow_handler_threshold
+        self.handler_timeout = handler_timeout
         self.workdir = Path(workdir)
         self.plugins = plugins
         self.parse_mode = parse_mode
@@ -256,6 +315,7 @@ class Client(Methods):
         self.max_concurrent_transmissions = max_concurrent_transmissions
 
         self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="Handler")
+        self.process_executor: Optional[ProcessPoolExecutor] = None
 
         if self.session_string:
             self.storage = MemoryStorage(self.name, self.session_string)
@@ -264,7 +324,9 @@ class Client(Methods):
         else:
             self.storage = FileStorage(self.name, self.workdir)
 
+        self.metrics = metrics.Metrics()
         self.dispatcher = Dispatcher(self)
+        self.update_state = UpdateState(self)
 
         self.rnd_id = MsgId
 
@@ -488,6 +550,8 @@ class Client(Methods):
         is_min = False
         parsed_peers = []
 
+        self.update_state.cache_peers(peers)
+
         for peer in peers:
             if getattr(peer, "min", False):
                 is_min = True
@@ -532,85 +596,76 @@ class Client(Methods):
 
         return is_min
 
-    async def handle_updates(self, updates):
-        self.last_update_time = datetime.now()
-
-        if isinstance(updates, (raw.types.Updates, raw.types.UpdatesCombined)):
-            is_min = any((
-                await self.fetch_peers(updates.users),
-                await self.fetch_peers(updates.chats),
-            ))
+    async def fetch_min_peers(self, updates: list, users: dict, chats: dict):
+        """Fetch the full peers of new channel messages, which come along with min peers only.
 
-            users = {u.id: u for u in updates.users}
-            chats = {c.id: c for c in updates.chats}
+        A single difference is requested for each channel, covering all of its messages in the batch, and the
+        channels are fetched concurrently. The peers found are added to the given users and chats.
+        """
+        messages = {}
 
-            for update in updates.updates:
-                channel_id = getattr(
-                    getattr(
-                        getattr(
-                            update, "message", None
-                        ), "peer_id", None
-                    ), "channel_id", None
-                ) or getattr(update, "channel_id", None)
+        for update in updates:
+            if isinstance(update, raw.types.UpdateNewChannelMessage):
+                message = update.message
 
-                pts = getattr(update, "pts", None)
-                pts_count = getattr(update, "pts_count", None)
+                if not isinstance(message, raw.types.MessageEmpty):
+                    messages.setdefault(message.peer_id.channel_id, []).append(update)
 
-                if isinstance(update, raw.types.UpdateChannelTooLong):
-                    log.info(update)
+        async def fetch(channel_id: int, channel_updates: list):
+            try:
+                diff = await self.invoke(
+                    raw.functions.updates.GetChannelDifference(
+                        channel=await self.resolve_peer(utils.get_channel_id(channel_id)),
+                        filter=raw.types.ChannelMessagesFilter(
+                            ranges=[
+                                raw.types.MessageRange(min_id=u.message.id, max_id=u.message.id)
+                                for u in channel_updates
+                            ]
+                        ),
+                        pts=min(u.pts - u.pts_count for u in channel_updates),
+                        limit=max(u.pts for u in channel_updates)
+                    )
+                )
+            except ChannelPrivate:
+                pass
+            else:
+                if not isinstance(diff, raw.types.updates.ChannelDifferenceEmpty):
+                    users.update({u.id: u for u in diff.users})
+                    chats.update({c.id: c for c in diff.chats})
 
-                if isinstance(update, raw.types.UpdateNewChannelMessage) and is_min:
-                    message = update.message
+        await asyncio.gather(*[fetch(channel_id, u) for channel_id, u in messages.items()])
 
-                    if not isinstance(message, raw.types.MessageEmpty):
-                        try:
-                            diff = await self.invoke(
-                                raw.functions.updates.GetChannelDifference(
-                                    channel=await self.resolve_peer(utils.get_channel_id(channel_id)),
-                                    filter=raw.types.ChannelMessagesFilter(
-                                        ranges=[raw.types.MessageRange(
-                                            min_id=update.message.id,
-                                            max_id=update.message.id
-                                        )]
-                                    ),
-                                    pts=pts - pts_count,
-                                    limit=pts
-                                )
-                            )
-                        except ChannelPrivate:
-                            pass
-                        else:
-                            if not isinstance(diff, raw.types.updates.ChannelDifferenceEmpty):
-                                users.update({u.id: u for u in diff.users})
-                                chats.update({c.id: c for c in diff.chats})
-
-                self.dispatcher.updates_queue.put_nowait((update, users, chats))
-        elif isinstance(updates, (raw.types.UpdateShortMessage, raw.types.UpdateShortChatMessage)):
-            diff = await self.invoke(
-                raw.functions.updates.GetDifference(
-                    pts=updates.pts - updates.pts_count,
-                    date=updates.date,
-                    qts=-1
-                )
-            )
+    async def handle_updates(self, updates):
+        self.last_update_time = datetime.now()
+        started_at = time.monotonic()
 
-            if diff.new_messages:
-                self.dispatcher.updates_queue.put_nowait((
-                    raw.types.UpdateNewMessage(
-                        message=diff.new_messages[0],
-                        pts=updates.pts,
-                        pts_count=updates.pts_count
-                    ),
-                    {u.id: u for u in diff.users},
-                    {c.id: c for c in diff.chats}
+        try:
+            if isinstance(updates, (raw.types.Updates, raw.types.UpdatesCombined)):
+                is_min = any((
+                    await self.fetch_peers(updates.users),
+                    await self.fetch_peers(updates.chats),
                 ))
-            else:
-                if diff.other_updates:  # The other_updates list can be empty
-                    self.dispatcher.updates_queue.put_nowait((diff.other_updates[0], {}, {}))
-        elif isinstance(updates, raw.types.UpdateShort):
-            self.dispatcher.updates_queue.put_nowait((updates.update, {}, {}))
-        elif isinstance(updates, raw.types.UpdatesTooLong):
-            log.info(updates)
+
+                users = {u.id: u for u in updates.users}
+                chats = {c.id: c for c in updates.chats}
+
+                if not await self.update_state.process_seq(updates):
+                    return
+
+                if is_min:
+                    await self.fetch_min_peers(updates.updates, users, chats)
+
+                for update in updates.updates:
+                    await self.update_state.process(update, users, chats)
+            elif isinstance(updates, (raw.types.UpdateShortMessage, raw.types.UpdateShortChatMessage)):
+                await self.update_state.process(updates, {}, {})
+            elif isinstance(updates, raw.types.UpdateShort):
+                await self.update_state.process(updates.update, {}, {})
+            elif isinstance(updates, raw.types.UpdatesTooLong):
+                log.info(updates)
+                await self.update_state.get_difference()
+        finally:
+            self.metrics.observe(metrics.HANDLE_UPDATES, time.monotonic() - started_at)
 
     async def load_session(self):
         await self.storage.open()
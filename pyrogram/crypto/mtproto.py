@@ -39,7 +39,10 @@ def kdf(auth_key: bytes, msg_key: bytes, outgoing: bool) -> tuple:
 
 
 def pack(message: Message, salt: int, session_id: bytes, auth_key: bytes, auth_key_id: bytes) -> bytes:
-    data = Long(salt) + session_id + message.write()
+    data = bytearray(Long(salt))
+    data += session_id
+    message.write_to(data)
+
     padding = urandom(-(len(data) + 12) % 16 + 12)
 
     # 88 = 88 + 0 (outgoing message)
@@ -17,17 +17,23 @@
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
 import asyncio
+import copy
 import inspect
 import logging
-from collections import OrderedDict
+import re
+import threading
+import time
+from collections import OrderedDict, Counter, deque
+from typing import List, Dict, Tuple, Callable, Optional
 
 import pyrogram
-from pyrogram import utils
+from pyrogram import enums, metrics, utils, process_executor
 from pyrogram.handlers import (
     CallbackQueryHandler, MessageHandler, EditedMessageHandler, DeletedMessagesHandler,
     UserStatusHandler, RawUpdateHandler, InlineQueryHandler, PollHandler,
     ChosenInlineResultHandler, ChatMemberUpdatedHandler, ChatJoinRequestHandler
 )
+from pyrogram.handlers.handler import Handler
 from pyrogram.raw.types import (
     UpdateNewMessage, UpdateNewChannelMessage, UpdateNewScheduledMessage,
     UpdateEditMessage, UpdateEditChannelMessage,
@@ -35,12 +41,329 @@ from pyrogram.raw.types import (
     UpdateBotCallbackQuery, UpdateInlineBotCallbackQuery,
     UpdateUserStatus, UpdateBotInlineQuery, UpdateMessagePoll,
     UpdateBotInlineSend, UpdateChatParticipant, UpdateChannelParticipant,
-    UpdateBotChatInviteRequester
+    UpdateBotChatInviteRequester, PeerUser, PeerChat, PeerChannel
 )
 
 log = logging.getLogger(__name__)
 
 
+def get_status_key(update: UpdateUserStatus) -> tuple:
+    return UpdateUserStatus, update.user_id
+
+
+def get_deleted_messages_key(update: UpdateDeleteMessages) -> tuple:
+    return type(update), getattr(update, "channel_id", None)
+
+
+def keep_latest(old: list, new: tuple) -> list:
+    return list(new)
+
+
+def merge_deleted_messages(old: list, new: tuple) -> list:
+    update = copy.copy(new[0])
+    update.messages = old[0].messages + update.messages
+    update.pts_count = old[0].pts_count + update.pts_count
+
+    return [update, {**old[1], **new[1]}, {**old[2], **new[2]}]
+
+
+class UpdatesQueue(asyncio.Queue):
+    """The queue updates wait in before being handled.
+
+    Once the queue is full, what happens to an incoming update depends on the policy of its type: the receiving side
+    waits for room, the oldest update that can be dropped goes (the incoming one, in case there's none), or the update
+    is merged into a similar one that is still waiting. Updates to coalesce are merged even before the queue is full,
+    since the one waiting is stale anyway.
+
+    Waiting for room only holds back the task handling the packet the update came with: packets keep being received,
+    since responses to queries come along with updates, hence updates waiting for room are not bounded themselves.
+    """
+
+    # Functions to get the key similar updates share and to merge two of them, by update type
+    COALESCERS: Dict[type, Tuple[Callable, Callable]] = {
+        UpdateUserStatus: (get_status_key, keep_latest),
+        UpdateDeleteMessages: (get_deleted_messages_key, merge_deleted_messages),
+        UpdateDeleteChannelMessages: (get_deleted_messages_key, merge_deleted_messages)
+    }
+
+    def __init__(self, maxsize: int = 0, policies: Dict[type, "enums.QueuePolicy"] = None):
+        super().__init__(maxsize)
+
+        self.policies = policies or {}
+
+        # Packets that can still be merged into, by key
+        self.waiting: Dict[tuple, list] = {}
+        self.times = deque()
+        # Times the packets the updates came with were received at, if known
+        self.received = deque()
+        self.last_times: Tuple[Optional[float], Optional[float]] = (None, None)
+
+        self.dropped = Counter()
+        self.coalesced = Counter()
+        self.max_lag = 0.0
+
+    @property
+    def lag(self) -> float:
+        """Seconds the oldest update in the queue has been waiting for."""
+        return time.monotonic() - self.times[0] if self.times else 0.0
+
+    def get_policy(self, update) -> "enums.QueuePolicy":
+        return self.policies.get(type(update), enums.QueuePolicy.BLOCK)
+
+    def get_key(self, update) -> Optional[tuple]:
+        coalescer = self.COALESCERS.get(type(update), None)
+
+        return coalescer[0](update) if coalescer is not None else None
+
+    def _put(self, item):
+        super()._put(item)
+        self.times.append(time.monotonic())
+        self.received.append(metrics.received_at.get())
+
+    def _get(self):
+        item = super()._get()
+
+        # Read by the worker right after getting the item, before anything else can get from the queue
+        self.last_times = self.times.popleft(), self.received.popleft()
+        self.max_lag = max(self.max_lag, time.monotonic() - self.last_times[0])
+        self.forget(item)
+
+        return item
+
+    def forget(self, packet):
+        if packet is not None:
+            key = self.get_key(packet[0])
+
+            if key is not None and self.waiting.get(key) is packet:
+                del self.waiting[key]
+
+    def get_droppable(self) -> Optional[int]:
+        """Get the position of the oldest packet whose policy allows dropping it, None in case there's none."""
+        for i, packet in enumerate(self._queue):
+            if packet is not None and self.get_policy(packet[0]) != enums.QueuePolicy.BLOCK:
+                return i
+
+        return None
+
+    def drop(self, index: int):
+        packet = self._queue[index]
+
+        del self._queue[index]
+        del self.times[index]
+        del self.received[index]
+
+        self.forget(packet)
+        self.task_done()
+
+        self.count_dropped(packet)
+
+    def count_dropped(self, packet):
+        self.dropped[type(packet[0]).__name__] += 1
+        log.debug("Dropped update: %s", type(packet[0]).__name__)
+
+    async def put(self, packet):
+        if packet is not None and self.full() and self.get_policy(packet[0]) != enums.QueuePolicy.BLOCK:
+            return self.put_nowait(packet)
+
+        await super().put(packet)
+
+    def put_nowait(self, packet):
+        if packet is None:
+            return super().put_nowait(packet)
+
+        update = packet[0]
+        policy = self.get_policy(update)
+        key = self.get_key(update) if policy == enums.QueuePolicy.COALESCE else None
+
+        if key is not None:
+            waiting = self.waiting.get(key, None)
+
+            if waiting is not None:
+                waiting[:] = self.COALESCERS[type(update)][1](waiting, packet)
+                self.coalesced[type(update).__name__] += 1
+                return
+
+            # Stored as a list so that it can be merged into in place
+            packet = list(packet)
+
+        if self.full() and policy != enums.QueuePolicy.BLOCK:
+            index = self.get_droppable()
+
+            # Updates that must not be dropped fill the queue, the incoming one is the only one that can go
+            if index is None:
+                self.count_dropped(packet)
+                return
+
+            self.drop(index)
+
+        super().put_nowait(packet)
+
+        if key is not None:
+            self.waiting[key] = packet
+
+
+class ShardedQueue:
+    """A set of queues updates are distributed onto by chat, so that updates of the same chat keep their order."""
+
+    def __init__(self, shards: int, factory: Callable[[], asyncio.Queue] = asyncio.Queue):
+        self.queues = [factory() for _ in range(shards)]
+
+    @staticmethod
+    def get_key(update) -> int:
+        peer = getattr(getattr(update, "message", None), "peer_id", None) or getattr(update, "peer", None)
+
+        if isinstance(peer, (PeerUser, PeerChat, PeerChannel)):
+            return utils.get_peer_id(peer)
+
+        channel_id = getattr(update, "channel_id", None)
+
+        if channel_id is not None:
+            return utils.get_channel_id(channel_id)
+
+        chat_id = getattr(update, "chat_id", None)
+
+        if chat_id is not None:
+            return -chat_id
+
+        # Updates that don't belong to any chat (e.g.: inline queries) are at least ordered by user
+        return getattr(update, "user_id", None) or 0
+
+    def get_queue(self, update) -> asyncio.Queue:
+        return self.queues[hash(self.get_key(update)) % len(self.queues)]
+
+    async def put(self, packet):
+        await self.get_queue(packet[0]).put(packet)
+
+    def put_nowait(self, packet):
+        self.get_queue(packet[0]).put_nowait(packet)
+
+    def qsize(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    def empty(self) -> bool:
+        return all(queue.empty() for queue in self.queues)
+
+    def depths(self) -> List[int]:
+        """Get the amount of updates waiting in each shard."""
+        return [queue.qsize() for queue in self.queues]
+
+
+class HandlerStats:
+    """Timings of a handler: calls, filter checks and their durations, exceptions raised and timeouts hit.
+
+    Percentiles are computed over the most recent calls only.
+    """
+
+    SAMPLES = 1000
+
+    __slots__ = ("count", "total", "filter_count", "filter_total", "exceptions", "timeouts", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.filter_count = 0
+        self.filter_total = 0.0
+        self.exceptions = 0
+        self.timeouts = 0
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.samples.append(elapsed)
+
+    def add_filter(self, elapsed: float):
+        self.filter_count += 1
+        self.filter_total += elapsed
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+
+        samples = sorted(self.samples)
+
+        return samples[round(p * (len(samples) - 1))]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "filter_count": self.filter_count,
+            "filter_total": self.filter_total,
+            "exceptions": self.exceptions,
+            "timeouts": self.timeouts
+        }
+
+
+class CommandIndex:
+    """The handlers of a group indexed by the commands their filters require.
+
+    Only the handlers whose command could be the one at the beginning of the message, plus the handlers not bound to
+    any command, are checked. The candidates keep their order and their filters still decide as usual.
+    """
+
+    def __init__(self, handlers: Tuple[Tuple[Handler, bool], ...]):
+        self.handlers = handlers
+        self.build()
+
+    def build(self):
+        self.unindexed = []
+        self.index: Dict[str, List[int]] = {}
+        self.prefixes = set()
+        # Filters can be changed after being registered, e.g.: by setting their commands
+        self.changes = pyrogram.filters.CommandSet.changes
+
+        for i, (handler, is_raw) in enumerate(self.handlers):
+            command_filter = None if is_raw else self.get_command_filter(handler.filters)
+
+            if command_filter is None:
+                self.unindexed.append(i)
+                continue
+
+            for command in command_filter.commands:
+                self.index.setdefault(command.lower(), []).append(i)
+
+            self.prefixes.update(command_filter.prefixes)
+
+    @staticmethod
+    def get_command_filter(flt) -> Optional["pyrogram.filters.Filter"]:
+        """Get the command filter a filter requires, in case its commands are plain words."""
+        for term in pyrogram.filters.CompiledFilter.flatten(flt, pyrogram.filters.AndFilter):
+            if type(term).__name__ == "CommandFilter":
+                if all(re.escape(c) == c and "@" not in c for c in term.commands):
+                    return term
+
+        return None
+
+    def select(self, client: "pyrogram.Client", message) -> Tuple[Tuple[Handler, bool], ...]:
+        if self.changes != pyrogram.filters.CommandSet.changes:
+            self.build()
+
+        text = getattr(message, "text", None) or getattr(message, "caption", None)
+        selected = set(self.unindexed)
+
+        if text:
+            username = (client.me.username or "").lower()
+
+            for prefix in self.prefixes:
+                if not text.startswith(prefix):
+                    continue
+
+                word = text[len(prefix):].split(maxsplit=1)
+                word = word[0].lower() if word else ""
+                command = word.split("@", 1)[0]
+
+                selected.update(self.index.get(command, ()))
+
+                # The mention can also come without "@"
+                if username and command.endswith(username):
+                    selected.update(self.index.get(command[:-len(username)], ()))
+
+        return tuple(self.handlers[i] for i in sorted(selected))
+
+
 class Dispatcher:
     NEW_MESSAGE_UPDATES = (UpdateNewMessage, UpdateNewChannelMessage, UpdateNewScheduledMessage)
     EDIT_MESSAGE_UPDATES = (UpdateEditMessage, UpdateEditChannelMessage)
@@ -53,15 +376,58 @@ class Dispatcher:
     CHOSEN_INLINE_RESULT_UPDATES = (UpdateBotInlineSend,)
     CHAT_JOIN_REQUEST_UPDATES = (UpdateBotChatInviteRequester,)
 
+    # Handler types whose groups get indexed by command, once they hold at least a number of command handlers
+    COMMAND_HANDLER_TYPES = (MessageHandler, EditedMessageHandler)
+    COMMAND_INDEX_THRESHOLD = 8
+
+    # Policies applied to a bounded updates queue, on top of the ones passed to the client
+    QUEUE_POLICIES = {
+        UpdateUserStatus: enums.QueuePolicy.COALESCE,
+        UpdateDeleteMessages: enums.QueuePolicy.COALESCE,
+        UpdateDeleteChannelMessages: enums.QueuePolicy.COALESCE
+    }
+
+    # Handler types the parsed updates are meant for, NoneType stands for updates that only raw handlers receive
+    HANDLER_TYPES = (
+        MessageHandler, EditedMessageHandler, DeletedMessagesHandler, CallbackQueryHandler, UserStatusHandler,
+        InlineQueryHandler, PollHandler, ChosenInlineResultHandler, ChatMemberUpdatedHandler, ChatJoinRequestHandler,
+        type(None)
+    )
+
     def __init__(self, client: "pyrogram.Client"):
         self.client = client
         self.loop = asyncio.get_event_loop()
 
         self.handler_worker_tasks = []
-        self.locks_list = []
 
-        self.updates_queue = asyncio.Queue()
-        self.groups = OrderedDict()
+        def queue_factory():
+            if not self.client.max_queue_size:
+                return UpdatesQueue()
+
+            return UpdatesQueue(
+                self.client.max_queue_size,
+                {**self.QUEUE_POLICIES, **(self.client.queue_policies or {})}
+            )
+
+        # With fan-out, updates are distributed across worker processes, which take care of sharding on their own
+        shards = self.client.fan_out or self.client.shards
+
+        self.updates_queue = (
+            ShardedQueue(shards, queue_factory)
+            if shards
+            else queue_factory()
+        )
+        self.fan_out = None
+        self.groups: "OrderedDict[int, Tuple[Handler, ...]]" = OrderedDict()
+        self.routes: Dict[type, Tuple[Tuple[Tuple[Handler, bool], ...], ...]] = {}
+        # Handler types at least one non-raw handler is registered for
+        self.consumed_types = frozenset()
+        # Serializes writers only, handlers can be registered from other threads as well
+        self.handlers_lock = threading.Lock()
+        self.update_routes(OrderedDict())
+        # Pending waiters by handler type, then by (chat ID, user ID), where None matches any chat or user
+        self.waiters: Dict[type, Dict[Tuple[Optional[int], Optional[int]], List[tuple]]] = {}
+        self.stats: Dict[Handler, HandlerStats] = {}
 
         async def message_parser(update, users, chats):
             return (
@@ -140,120 +506,360 @@ class Dispatcher:
             Dispatcher.CHAT_JOIN_REQUEST_UPDATES: chat_join_request_parser
         }
 
+        # Handler types each update is parsed for, known upfront so that parsing can be skipped when nobody listens
+        self.update_handler_types = {
+            Dispatcher.NEW_MESSAGE_UPDATES: MessageHandler,
+            Dispatcher.EDIT_MESSAGE_UPDATES: EditedMessageHandler,
+            Dispatcher.DELETE_MESSAGES_UPDATES: DeletedMessagesHandler,
+            Dispatcher.CALLBACK_QUERY_UPDATES: CallbackQueryHandler,
+            Dispatcher.USER_STATUS_UPDATES: UserStatusHandler,
+            Dispatcher.BOT_INLINE_QUERY_UPDATES: InlineQueryHandler,
+            Dispatcher.POLL_UPDATES: PollHandler,
+            Dispatcher.CHOSEN_INLINE_RESULT_UPDATES: ChosenInlineResultHandler,
+            Dispatcher.CHAT_MEMBER_UPDATES: ChatMemberUpdatedHandler,
+            Dispatcher.CHAT_JOIN_REQUEST_UPDATES: ChatJoinRequestHandler
+        }
+
         self.update_parsers = {key: value for key_tuple, value in self.update_parsers.items() for key in key_tuple}
+        self.update_handler_types = {
+            key: value for key_tuple, value in self.update_handler_types.items() for key in key_tuple
+        }
+
+    @property
+    def queues(self) -> List[asyncio.Queue]:
+        """The queues consumed by the workers, one per shard in case sharding is enabled."""
+        if isinstance(self.updates_queue, ShardedQueue):
+            return self.updates_queue.queues
+
+        return [self.updates_queue] * self.client.workers
+
+    @property
+    def queue_depths(self) -> List[int]:
+        """Get the amount of updates waiting to be handled, per shard in case sharding is enabled."""
+        if isinstance(self.updates_queue, ShardedQueue):
+            return self.updates_queue.depths()
+
+        return [self.updates_queue.qsize()]
+
+    @property
+    def queue_stats(self) -> dict:
+        """Get the state of the updates queue: amount of updates waiting (per shard), seconds the oldest one has been
+        waiting for, longest wait observed and amount of updates dropped and coalesced, by type."""
+        queues = list(dict.fromkeys(self.queues))
+
+        return {
+            "depths": self.queue_depths,
+            "lag": max(queue.lag for queue in queues),
+            "max_lag": max(queue.max_lag for queue in queues),
+            "dropped": sum((queue.dropped for queue in queues), Counter()),
+            "coalesced": sum((queue.coalesced for queue in queues), Counter())
+        }
+
+    @property
+    def handler_stats(self) -> Dict[Handler, dict]:
+        """Get the timings of the handlers that have been called, by handler: amount of calls, seconds spent in total,
+        median and 99th percentile durations in seconds, amount of filter checks and seconds spent in total, amount of
+        exceptions raised and timeouts hit."""
+        return {handler: stats.to_dict() for handler, stats in list(self.stats.items())}
 
     async def start(self):
         if not self.client.no_updates:
-            for i in range(self.client.workers):
-                self.locks_list.append(asyncio.Lock())
+            if self.client.fan_out:
+                from pyrogram.fan_out import FanOut
+
+                self.fan_out = FanOut(self.client, self.queues)
+                await self.fan_out.start()
+                return
 
+            for queue in self.queues:
                 self.handler_worker_tasks.append(
-                    self.loop.create_task(self.handler_worker(self.locks_list[-1]))
+                    self.loop.create_task(self.handler_worker(queue))
                 )
 
-            log.info("Started %s HandlerTasks", self.client.workers)
+            log.info("Started %s HandlerTasks", len(self.handler_worker_tasks))
 
     async def stop(self):
         if not self.client.no_updates:
-            for i in range(self.client.workers):
-                self.updates_queue.put_nowait(None)
+            for queue in self.queues:
+                await queue.put(None)
+
+            if self.fan_out is not None:
+                await self.fan_out.stop()
+                self.fan_out = None
 
             for i in self.handler_worker_tasks:
                 await i
 
+            log.info("Stopped %s HandlerTasks", len(self.handler_worker_tasks))
+
             self.handler_worker_tasks.clear()
-            self.groups.clear()
 
-            log.info("Stopped %s HandlerTasks", self.client.workers)
+            with self.handlers_lock:
+                self.update_routes(OrderedDict())
 
-    def add_handler(self, handler, group: int):
-        async def fn():
-            for lock in self.locks_list:
-                await lock.acquire()
+    def update_routes(self, groups: "OrderedDict[int, Tuple[Handler, ...]]"):
+        """Replace the handler groups and rebuild the table routing each handler type to the handlers interested in
+        it, group by group.
 
-            try:
-                if group not in self.groups:
-                    self.groups[group] = []
-                    self.groups = OrderedDict(sorted(self.groups.items()))
+        Every entry is a (handler, is_raw) pair, groups with many command handlers are indexed by command instead.
+        Neither the groups nor the table are ever changed in place: a new copy is built and swapped in, so that
+        workers keep walking a consistent snapshot without any locking.
+        """
+        routes = {}
+        consumed_types = set()
 
-                self.groups[group].append(handler)
-            finally:
-                for lock in self.locks_list:
-                    lock.release()
+        for handler_type in self.HANDLER_TYPES:
+            handler_groups = []
+
+            for group in groups.values():
+                handlers = tuple(
+                    (handler, not isinstance(handler, handler_type))
+                    for handler in group
+                    if isinstance(handler, (handler_type, RawUpdateHandler))
+                )
+
+                if not handlers:
+                    continue
+
+                if not all(is_raw for _, is_raw in handlers):
+                    consumed_types.add(handler_type)
+
+                if handler_type in self.COMMAND_HANDLER_TYPES:
+                    commands = sum(
+                        1 for handler, is_raw in handlers
+                        if not is_raw and CommandIndex.get_command_filter(handler.filters) is not None
+                    )
+
+                    if commands >= self.COMMAND_INDEX_THRESHOLD:
+                        handlers = CommandIndex(handlers)
 
-        self.loop.create_task(fn())
+                handler_groups.append(handlers)
+
+            routes[handler_type] = tuple(handler_groups)
+
+        self.groups, self.routes, self.consumed_types = groups, routes, frozenset(consumed_types)
+
+    def add_handler(self, handler, group: int):
+        if callable(getattr(handler, "filters", None)):
+            handler.compile_filters()
+
+        with self.handlers_lock:
+            groups = OrderedDict(self.groups)
+            groups[group] = groups.get(group, ()) + (handler,)
+
+            self.update_routes(OrderedDict(sorted(groups.items())))
 
     def remove_handler(self, handler, group: int):
-        async def fn():
-            for lock in self.locks_list:
-                await lock.acquire()
+        with self.handlers_lock:
+            if group not in self.groups:
+                raise ValueError(f"Group {group} does not exist. Handler was not removed.")
+
+            handlers = list(self.groups[group])
+            handlers.remove(handler)
+
+            groups = OrderedDict(self.groups)
+            groups[group] = tuple(handlers)
+
+            self.update_routes(groups)
+            self.stats.pop(handler, None)
+
+    def add_waiter(
+        self,
+        handler_type: type,
+        chat_id: Optional[int],
+        user_id: Optional[int],
+        filters: Optional["pyrogram.filters.Filter"]
+    ) -> tuple:
+        waiter = self.loop.create_future(), pyrogram.filters.CompiledFilter(filters) if callable(filters) else None
+        self.waiters.setdefault(handler_type, {}).setdefault((chat_id, user_id), []).append(waiter)
+
+        return waiter
+
+    def remove_waiter(self, handler_type: type, chat_id: Optional[int], user_id: Optional[int], waiter: tuple):
+        index = self.waiters.get(handler_type, {})
+        waiters = index.get((chat_id, user_id), [])
+
+        if waiter in waiters:
+            waiters.remove(waiter)
+
+        # Empty entries are dropped, so that updates nobody waits for skip the lookup altogether
+        if not waiters:
+            index.pop((chat_id, user_id), None)
+
+        if not index:
+            self.waiters.pop(handler_type, None)
+
+    async def resolve_waiters(self, handler_type: type, update) -> bool:
+        """Hand the update over to the most specific pending waiter it matches, if any, in which case handlers are
+        skipped. Waiters for its chat and user come first, then for its chat, its user and any update."""
+        index = self.waiters.get(handler_type)
+
+        if not index:
+            return False
+
+        chat = getattr(update, "chat", None) or getattr(getattr(update, "message", None), "chat", None)
+        user = getattr(update, "from_user", None)
+
+        chat_id = getattr(chat, "id", None)
+        user_id = getattr(user, "id", None)
+
+        for key in dict.fromkeys(((chat_id, user_id), (chat_id, None), (None, user_id), (None, None))):
+            # Waiters might be added or resolved while filters are awaited, walk a copy
+            for waiter in list(index.get(key, ())):
+                future, filters = waiter
+
+                if future.done():
+                    continue
+
+                try:
+                    if filters is not None and not await filters(self.client, update):
+                        continue
+                except Exception as e:
+                    log.exception(e)
+                    continue
+
+                if not future.done():
+                    future.set_result(update)
+                    self.remove_waiter(handler_type, *key, waiter)
+
+                    return True
+
+        return False
+
+    async def call_with_timeout(self, handler: Handler, args: tuple, stats: HandlerStats, timeout: float):
+        # Unlike asyncio.wait_for, this tells the timeout apart from a TimeoutError raised by the callback itself
+        task = self.loop.create_task(handler.callback(self.client, *args))
+
+        try:
+            done, _ = await asyncio.wait((task,), timeout=timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+        if not done:
+            stats.timeouts += 1
+            log.warning("Handler %s cancelled after %s seconds", handler.callback.__qualname__, timeout)
+
+            task.cancel()
 
             try:
-                if group not in self.groups:
-                    raise ValueError(f"Group {group} does not exist. Handler was not removed.")
+                await task
+            except asyncio.CancelledError:
+                pass
+        else:
+            task.result()
 
-                self.groups[group].remove(handler)
-            finally:
-                for lock in self.locks_list:
-                    lock.release()
+    def record(self, handler: Handler, stats: HandlerStats, elapsed: float):
+        stats.add(elapsed)
+
+        threshold = self.client.slow_handler_threshold
 
-        self.loop.create_task(fn())
+        if threshold is not None and elapsed > threshold:
+            log.warning("Handler %s took %.3f seconds", handler.callback.__qualname__, elapsed)
 
-    async def handler_worker(self, lock):
+    async def handler_worker(self, queue: asyncio.Queue):
         while True:
-            packet = await self.updates_queue.get()
+            packet = await queue.get()
 
             if packet is None:
                 break
 
+            started_at = time.monotonic()
+            queued_at, received_at = getattr(queue, "last_times", (None, None))
+            filter_time = callback_time = 0.0
+
+            if queued_at is not None:
+                self.client.metrics.observe(metrics.QUEUE, started_at - queued_at)
+
             try:
                 update, users, chats = packet
-                parser = self.update_parsers.get(type(update), None)
 
-                parsed_update, handler_type = (
-                    await parser(update, users, chats)
-                    if parser is not None
-                    else (None, type(None))
-                )
+                # Updates only raw handlers (if any) listen to are not parsed at all, sparing any request made by parsers
+                update_handler_type = self.update_handler_types.get(type(update), None)
 
-                async with lock:
-                    for group in self.groups.values():
-                        for handler in group:
-                            args = None
-
-                            if isinstance(handler, handler_type):
-                                try:
-                                    if await handler.check(self.client, parsed_update):
-                                        args = (parsed_update,)
-                                except Exception as e:
-                                    log.exception(e)
-                                    continue
+                if update_handler_type in self.consumed_types or update_handler_type in self.waiters:
+                    parsed_update, handler_type = await self.update_parsers[type(update)](update, users, chats)
+                    self.client.metrics.observe(metrics.PARSE, time.monotonic() - started_at)
+                else:
+                    parsed_update, handler_type = None, type(None)
 
-                            elif isinstance(handler, RawUpdateHandler):
-                                args = (update, users, chats)
+                # Updates a conversation is waiting for are consumed by it, handlers don't see them
+                if self.waiters and await self.resolve_waiters(handler_type, parsed_update):
+                    continue
 
-                            if args is None:
-                                continue
+                # Take a snapshot, handlers registered meanwhile only apply to the next updates
+                for group in self.routes[handler_type]:
+                    if type(group) is CommandIndex:
+                        group = group.select(self.client, parsed_update)
+
+                    for handler, is_raw in group:
+                        stats = self.stats.get(handler)
+
+                        if stats is None:
+                            stats = self.stats[handler] = HandlerStats()
+
+                        if is_raw:
+                            args = (update, users, chats)
+                        else:
+                            start = time.perf_counter()
 
                             try:
-                                if inspect.iscoroutinefunction(handler.callback):
-                                    await handler.callback(self.client, *args)
-                                else:
-                                    await self.loop.run_in_executor(
-                                        self.client.executor,
-                                        handler.callback,
-                                        self.client,
-                                        *args
-                                    )
-                            except pyrogram.StopPropagation:
-                                raise
-                            except pyrogram.ContinuePropagation:
-                                continue
+                                if not await handler.check(self.client, parsed_update):
+                                    continue
                             except Exception as e:
                                 log.exception(e)
+                                continue
+                            finally:
+                                elapsed = time.perf_counter() - start
+                                filter_time += elapsed
+                                stats.add_filter(elapsed)
+
+                            args = (parsed_update,)
+
+                        start = time.perf_counter()
+
+                        try:
+                            if getattr(handler.callback, "run_in_process", False):
+                                await process_executor.execute(self.client, handler.callback, *args)
+                            elif inspect.iscoroutinefunction(handler.callback):
+                                timeout = handler.timeout or self.client.handler_timeout
 
-                            break
+                                if timeout is None:
+                                    await handler.callback(self.client, *args)
+                                else:
+                                    await self.call_with_timeout(handler, args, stats, timeout)
+                            else:
+                                # Functions running in threads can't be interrupted, they are only timed
+                                await self.loop.run_in_executor(
+                                    self.client.executor,
+                                    handler.callback,
+                                    self.client,
+                                    *args
+                                )
+                        except pyrogram.StopPropagation:
+                            raise
+                        except pyrogram.ContinuePropagation:
+                            continue
+                        except Exception as e:
+                            stats.exceptions += 1
+                            log.exception(e)
+                        finally:
+                            elapsed = time.perf_counter() - start
+                            callback_time += elapsed
+                            self.record(handler, stats, elapsed)
+
+                        break
             except pyrogram.StopPropagation:
                 pass
             except Exception as e:
                 log.exception(e)
+            finally:
+                # Updates no handler has been checked or called for don't count
+                if filter_time:
+                    self.client.metrics.observe(metrics.FILTER, filter_time)
+
+                if callback_time:
+                    self.client.metrics.observe(metrics.CALLBACK, callback_time)
+
+                if received_at is not None:
+                    self.client.metrics.observe(metrics.TOTAL, time.monotonic() - received_at)
@@ -28,6 +28,7 @@ from .messages_filter import MessagesFilter
 from .next_code_type import NextCodeType
 from .parse_mode import ParseMode
 from .poll_type import PollType
+from .queue_policy import QueuePolicy
 from .sent_code_type import SentCodeType
 from .user_status import UserStatus
 
@@ -44,6 +45,7 @@ __all__ = [
     'NextCodeType', 
     'ParseMode', 
     'PollType', 
+    'QueuePolicy', 
     'SentCodeType', 
     'UserStatus'
 ]
@@ -0,0 +1,35 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from enum import auto
+
+from .auto_name import AutoName
+
+
+class QueuePolicy(AutoName):
+    """Queue policy enumeration used in :obj:`~pyrogram.Client` to decide what to do with updates once the updates
+    queue is full"""
+
+    BLOCK = auto()
+    "Wait for room in the queue, holding back the updates behind"
+
+    DROP_OLDEST = auto()
+    "Drop the oldest update waiting in the queue"
+
+    COALESCE = auto()
+    "Merge the update with a similar one still waiting in the queue, drop the oldest update if there's none"
@@ -0,0 +1,304 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import socket
+from io import BytesIO
+from struct import Struct
+from typing import List, Optional
+
+import pyrogram
+from pyrogram import process_executor
+from pyrogram.errors import RPCError
+from pyrogram.raw.core import TLObject, Int, Vector
+from pyrogram.session import Session
+
+log = logging.getLogger(__name__)
+
+# Frame header: payload length and kind
+HEADER = Struct("<IB")
+
+UPDATE = 0
+INVOKE = 1
+RESULT = 2
+STOP = 3
+
+
+def encode_packet(update: TLObject, users: dict, chats: dict) -> bytes:
+    """Serialize an update along with its users and chats as TL bytes."""
+    b = bytearray()
+
+    update.write_to(b)
+    Vector.write_to(b, list(users.values()))
+    Vector.write_to(b, list(chats.values()))
+
+    return bytes(b)
+
+
+def decode_packet(data: bytes) -> tuple:
+    b = BytesIO(data)
+
+    update = TLObject.read(b)
+
+    Int.read(b)  # Vector ID
+    users = Vector.read(b, TLObject)
+
+    Int.read(b)
+    chats = Vector.read(b, TLObject)
+
+    return update, {u.id: u for u in users}, {c.id: c for c in chats}
+
+
+async def write_frame(writer: asyncio.StreamWriter, lock: asyncio.Lock, kind: int, payload: bytes):
+    async with lock:
+        writer.write(HEADER.pack(len(payload), kind) + payload)
+        await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[tuple]:
+    try:
+        size, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+        return kind, await reader.readexactly(size)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class FanOut:
+    """Hands incoming updates over to worker processes, which execute the handlers.
+
+    The process owning the connection keeps receiving updates and invoking queries, while each worker process runs
+    its own dispatcher with a copy of the handlers registered before the fan-out started. Updates are distributed by
+    chat, so that updates of the same chat keep their order, and travel as TL bytes over a Unix socket. Queries
+    invoked by handlers are forwarded back and invoked on the workers' behalf. Worker processes are forked, hence this
+    is only available on platforms supporting fork.
+    """
+
+    def __init__(self, client: "pyrogram.Client", queues: List[asyncio.Queue]):
+        self.client = client
+        self.queues = queues
+
+        self.processes = []
+        self.tasks = []
+
+    async def start(self):
+        if not hasattr(os, "fork"):
+            raise ValueError("Fanning updates out to worker processes requires a platform supporting fork")
+
+        context = multiprocessing.get_context("fork")
+
+        for queue in self.queues:
+            parent_socket, child_socket = socket.socketpair()
+
+            process = context.Process(target=run_worker, args=(self.client, child_socket), daemon=True)
+            process.start()
+            child_socket.close()
+
+            reader, writer = await asyncio.open_unix_connection(sock=parent_socket)
+            lock = asyncio.Lock()
+
+            self.processes.append(process)
+            self.tasks.append(self.client.loop.create_task(self.forward_updates(queue, writer, lock)))
+            self.tasks.append(self.client.loop.create_task(self.serve_requests(reader, writer, lock)))
+
+        log.info("Started %s worker processes", len(self.processes))
+
+    async def stop(self):
+        # Forwarders stop once they get the None put in their queue, requests being served are let finish
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        for process in self.processes:
+            await self.client.loop.run_in_executor(None, process.join)
+
+        log.info("Stopped %s worker processes", len(self.processes))
+
+        self.processes.clear()
+        self.tasks.clear()
+
+    async def forward_updates(self, queue: asyncio.Queue, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        is_connected = True
+
+        while True:
+            packet = await queue.get()
+
+            try:
+                if packet is None:
+                    # The worker stops once its handlers are done, which might still need to invoke queries
+                    await write_frame(writer, lock, STOP, b"")
+                    break
+
+                # Keep consuming the queue even if the worker is gone, so that the receiving side never blocks on it
+                if is_connected:
+                    await write_frame(writer, lock, UPDATE, encode_packet(*packet))
+            except ConnectionError as e:
+                log.warning("Worker process gone: %s", e)
+                is_connected = False
+            except Exception as e:
+                log.exception(e)
+
+    async def serve_requests(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        # The worker closes its side once it has stopped
+        while True:
+            frame = await read_frame(reader)
+
+            if frame is None:
+                break
+
+            self.client.loop.create_task(self.serve_request(frame[1], writer, lock))
+
+        writer.close()
+
+    async def serve_request(self, payload: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        request_id, query, retries, timeout, sleep_threshold = pickle.loads(payload)
+        result = error = None
+
+        try:
+            result = await self.client.invoke(query, retries, timeout, sleep_threshold)
+        except RPCError as e:
+            # RPC errors are rebuilt on the other side, pickling them would lose their value
+            error = type(e), e.value
+        except Exception as e:
+            error = e
+
+        try:
+            payload = pickle.dumps((request_id, result, error))
+        except Exception as e:
+            payload = pickle.dumps((request_id, None, RuntimeError(repr(e))))
+
+        try:
+            await write_frame(writer, lock, RESULT, payload)
+        except ConnectionError:
+            pass
+
+
+class WorkerClient(pyrogram.Client):
+    """The client handlers receive in worker processes, forwarding the queries they invoke to the owner process."""
+
+    def __init__(self, client: "pyrogram.Client", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        super().__init__(
+            client.name,
+            in_memory=True,
+            workers=client.workers,
+            process_workers=client.process_workers,
+            shards=client.shards,
+            slow_handler_threshold=client.slow_handler_threshold,
+            handler_timeout=client.handler_timeout,
+            parse_mode=client.parse_mode,
+            sleep_threshold=client.sleep_threshold,
+            max_concurrent_transmissions=client.max_concurrent_transmissions
+        )
+
+        self.me = client.me
+        self.reader = reader
+        self.writer = writer
+        self.lock = asyncio.Lock()
+
+        self.requests = {}
+        self.request_ids = itertools.count()
+
+    async def invoke(
+        self,
+        query: TLObject,
+        retries: int = Session.MAX_RETRIES,
+        timeout: float = Session.WAIT_TIMEOUT,
+        sleep_threshold: float = None
+    ):
+        request_id = next(self.request_ids)
+        future = self.requests[request_id] = self.loop.create_future()
+
+        await write_frame(
+            self.writer, self.lock, INVOKE,
+            pickle.dumps((request_id, query, retries, timeout, sleep_threshold))
+        )
+
+        r = await future
+
+        await self.fetch_peers(getattr(r, "users", []))
+        await self.fetch_peers(getattr(r, "chats", []))
+
+        return r
+
+    def resolve(self, payload: bytes):
+        request_id, result, error = pickle.loads(payload)
+        future = self.requests.pop(request_id, None)
+
+        if future is None or future.done():
+            return
+
+        if isinstance(error, tuple):
+            error_type, value = error
+            future.set_exception(error_type(value=value))
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def run(self, groups):
+        await self.storage.open()
+        await self.storage.user_id(self.me.id)
+        await self.storage.is_bot(self.me.is_bot)
+
+        self.is_connected = True
+        self.dispatcher.update_routes(groups)
+        await self.dispatcher.start()
+
+        stop_task = None
+
+        # Results keep coming after the owner asked to stop, until it closes its side
+        while True:
+            frame = await read_frame(self.reader)
+
+            if frame is None:
+                break
+
+            kind, payload = frame
+
+            if kind == UPDATE:
+                update, users, chats = decode_packet(payload)
+
+                await self.fetch_peers(list(users.values()))
+                await self.fetch_peers(list(chats.values()))
+
+                await self.dispatcher.updates_queue.put((update, users, chats))
+            elif kind == RESULT:
+                self.resolve(payload)
+            elif kind == STOP:
+                stop_task = self.loop.create_task(self.stop_dispatching())
+
+        if stop_task is not None:
+            await stop_task
+
+        await self.storage.close()
+
+    async def stop_dispatching(self):
+        await self.dispatcher.stop()
+        self.writer.close()
+
+
+def run_worker(client: "pyrogram.Client", sock: socket.socket):
+    process_executor.initialize()
+
+    async def main():
+        reader, writer = await asyncio.open_unix_connection(sock=sock)
+        await WorkerClient(client, reader, writer).run(client.dispatcher.groups)
+
+    asyncio.get_event_loop().run_until_complete(main())
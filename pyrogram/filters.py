@@ -18,6 +18,7 @@
 
 import inspect
 import re
+import time
 from typing import Callable, Union, List, Pattern
 
 import pyrogram
@@ -118,6 +119,156 @@ class OrFilter(Filter):
         return x or y
 
 
+def run_inline(coroutine):
+    """Run a coroutine that never suspends to completion without going through the event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+
+    coroutine.close()
+    raise RuntimeError("Inline filters must not await")
+
+
+class Term:
+    __slots__ = ("evaluate", "is_async", "calls", "hits", "time")
+
+    def __init__(self, evaluate: Callable, is_async: bool):
+        self.evaluate = evaluate
+        self.is_async = is_async
+
+        # Statistics used to reorder terms: evaluations, short-circuits caused and time spent
+        self.calls = 0
+        self.hits = 0
+        self.time = 0.0
+
+    @property
+    def rank(self) -> float:
+        # Cheap terms that are likely to short-circuit go first
+        return (self.time / self.calls) / ((self.hits + 1) / (self.calls + 1)) if self.calls else 0.0
+
+
+class CompiledFilter:
+    """A filter tree compiled once into a flat evaluation plan.
+
+    Nested ``&``, ``|`` and ``~`` are flattened into lists of terms, whether each filter is a coroutine function is
+    checked once instead of on every update and the built-in filters, which never await, are evaluated inline without
+    creating tasks or scheduling anything. With ``REORDER`` enabled, the terms of each ``&`` and ``|`` are also
+    periodically reordered by measured cost and short-circuit rate. Note that reordering changes which filters run
+    first, hence it's only suitable for filters without side effects relied upon (e.g.: *message.command*).
+    """
+
+    REORDER = False
+    REORDER_INTERVAL = 1000  # Evaluations between two reorderings
+
+    def __init__(self, flt: "Filter"):
+        self.filter = flt
+        self.root = self.build(flt)
+
+    async def __call__(self, client: "pyrogram.Client", update: Update) -> bool:
+        root = self.root
+
+        if root.is_async:
+            return await root.evaluate(client, update)
+
+        return root.evaluate(client, update)
+
+    @staticmethod
+    def flatten(flt: "Filter", kind: type) -> list:
+        if type(flt) is kind:
+            return CompiledFilter.flatten(flt.base, kind) + CompiledFilter.flatten(flt.other, kind)
+
+        return [flt]
+
+    def build(self, flt: "Filter") -> Term:
+        if type(flt) in (AndFilter, OrFilter):
+            terms = [self.build(f) for f in self.flatten(flt, type(flt))]
+            return self.build_group(terms, type(flt) is AndFilter)
+
+        if type(flt) is InvertFilter:
+            return self.build_not(self.build(flt.base))
+
+        if not inspect.iscoroutinefunction(flt.__call__):
+            return Term(
+                lambda client, update: client.loop.run_in_executor(client.executor, flt, client, update),
+                True
+            )
+
+        if getattr(type(flt).__call__, "__module__", None) == __name__:
+            return Term(lambda client, update: run_inline(flt(client, update)), False)
+
+        return Term(flt, True)
+
+    @staticmethod
+    def build_not(term: Term) -> Term:
+        evaluate = term.evaluate
+
+        if not term.is_async:
+            return Term(lambda client, update: not evaluate(client, update), False)
+
+        async def invert(client, update):
+            return not await evaluate(client, update)
+
+        return Term(invert, True)
+
+    def build_group(self, terms: List[Term], is_and: bool) -> Term:
+        # An "and" group short-circuits on the first falsy term, an "or" group on the first truthy one
+        stop = not is_and
+
+        if self.REORDER:
+            return self.build_reordered(terms, stop)
+
+        if not any(term.is_async for term in terms):
+            functions = [term.evaluate for term in terms]
+
+            def evaluate(client, update):
+                for function in functions:
+                    if bool(function(client, update)) is stop:
+                        return stop
+
+                return not stop
+
+            return Term(evaluate, False)
+
+        plan = [(term.evaluate, term.is_async) for term in terms]
+
+        async def evaluate(client, update):
+            for function, is_async in plan:
+                x = await function(client, update) if is_async else function(client, update)
+
+                if bool(x) is stop:
+                    return stop
+
+            return not stop
+
+        return Term(evaluate, True)
+
+    def build_reordered(self, terms: List[Term], stop: bool) -> Term:
+        calls = 0
+
+        async def evaluate(client, update):
+            nonlocal terms, calls
+
+            calls += 1
+
+            if calls % self.REORDER_INTERVAL == 0:
+                terms = sorted(terms, key=lambda t: t.rank)
+
+            for term in terms:
+                start = time.perf_counter()
+                x = await term.evaluate(client, update) if term.is_async else term.evaluate(client, update)
+                term.time += time.perf_counter() - start
+                term.calls += 1
+
+                if bool(x) is stop:
+                    term.hits += 1
+                    return stop
+
+            return not stop
+
+        return Term(evaluate, True)
+
+
 CUSTOM_FILTER_NAME = "CustomFilter"
 
 
@@ -747,6 +898,33 @@ linked_channel = create(linked_channel_filter)
 
 
 # region command_filter
+def count_changes(cls: type) -> type:
+    def wrap(method: Callable) -> Callable:
+        def wrapper(self, *args):
+            CommandSet.changes += 1
+            return method(self, *args)
+
+        return wrapper
+
+    for name in (
+        "add", "clear", "discard", "pop", "remove", "update", "difference_update", "intersection_update",
+        "symmetric_difference_update", "__ior__", "__iand__", "__isub__", "__ixor__"
+    ):
+        setattr(cls, name, wrap(getattr(set, name)))
+
+    return cls
+
+
+@count_changes
+class CommandSet(set):
+    """The commands or prefixes of a command filter, counting the changes made to any of them.
+
+    Whatever is built out of command filters (their matchers, the dispatcher command indexes) is built again only once
+    the count has changed, instead of comparing the commands for every update.
+    """
+    changes = 0
+
+
 def command(commands: Union[str, List[str]], prefixes: Union[str, List[str]] = "/", case_sensitive: bool = False):
     """Filter commands, i.e.: text messages starting with "/" or any other custom prefix.
 
@@ -768,6 +946,22 @@ def command(commands: Union[str, List[str]], prefixes: Union[str, List[str]] = "
     """
     command_re = re.compile(r"([\"'])(.*?)(?<!\\)\1|(\S+)")
 
+    def get_matcher(flt, username: str) -> Pattern:
+        # A single pattern matching any prefix followed by any command, compiled again only in case the username or
+        # the commands and prefixes have changed
+        key = username, CommandSet.changes, flt.case_sensitive
+
+        if flt.matcher is None or flt.matcher[0] != key:
+            # Prefixes are always case sensitive
+            flt.matcher = key, re.compile(
+                rf"(?:{'|'.join(map(re.escape, flt.prefixes))})"
+                rf"(?{'' if flt.case_sensitive else 'i'}:"
+                rf"(?P<command>{'|'.join(sorted(flt.commands, key=len, reverse=True))})"
+                rf"(?:@?{username})?)(?:\s|$)"
+            )
+
+        return flt.matcher[1]
+
     async def func(flt, client: pyrogram.Client, message: Message):
         username = client.me.username or ""
         text = message.text or message.caption
@@ -776,32 +970,42 @@ def command(commands: Union[str, List[str]], prefixes: Union[str, List[str]] = "
         if not text:
             return False
 
-        for prefix in flt.prefixes:
-            if not text.startswith(prefix):
-                continue
+        match = get_matcher(flt, username).match(text)
 
-            without_prefix = text[len(prefix):]
+        if not match:
+            return False
+
+        cmd = match.group("command")
+        cmd = cmd if flt.case_sensitive else cmd.lower()
+
+        if cmd not in flt.commands:
+            # Commands can be patterns themselves, find out which one has matched
+            cmd = next(
+                (c for c in flt.commands
+                 if re.fullmatch(c, cmd, flags=re.IGNORECASE if not flt.case_sensitive else 0)),
+                cmd
+            )
 
-            for cmd in flt.commands:
-                if not re.match(rf"^(?:{cmd}(?:@?{username})?)(?:\s|$)", without_prefix,
-                                flags=re.IGNORECASE if not flt.case_sensitive else 0):
-                    continue
+        without_command = text[match.end():]
 
-                without_command = re.sub(rf"{cmd}(?:@?{username})?\s?", "", without_prefix, count=1,
-                                         flags=re.IGNORECASE if not flt.case_sensitive else 0)
+        # match.groups are 1-indexed, group(1) is the quote, group(2) is the text
+        # between the quotes, group(3) is unquoted, whitespace-split text
 
-                # match.groups are 1-indexed, group(1) is the quote, group(2) is the text
-                # between the quotes, group(3) is unquoted, whitespace-split text
+        # Remove the escape character from the arguments
+        message.command = [cmd] + [
+            re.sub(r"\\([\"'])", r"\1", m.group(2) or m.group(3) or "")
+            for m in command_re.finditer(without_command)
+        ]
 
-                # Remove the escape character from the arguments
-                message.command = [cmd] + [
-                    re.sub(r"\\([\"'])", r"\1", m.group(2) or m.group(3) or "")
-                    for m in command_re.finditer(without_command)
-                ]
+        return True
 
-                return True
+    def set_attribute(flt, name: str, value):
+        # Commands and prefixes set anew are counted as changed too
+        if name in ("commands", "prefixes"):
+            value = CommandSet(value)
+            CommandSet.changes += 1
 
-        return False
+        object.__setattr__(flt, name, value)
 
     commands = commands if isinstance(commands, list) else [commands]
     commands = {c if case_sensitive else c.lower() for c in commands}
@@ -813,9 +1017,11 @@ def command(commands: Union[str, List[str]], prefixes: Union[str, List[str]] = "
     return create(
         func,
         "CommandFilter",
-        commands=commands,
-        prefixes=prefixes,
-        case_sensitive=case_sensitive
+        __setattr__=set_attribute,
+        commands=CommandSet(commands),
+        prefixes=CommandSet(prefixes),
+        case_sensitive=case_sensitive,
+        matcher=None
     )
 
 
@@ -16,11 +16,10 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
-import inspect
 from typing import Callable
 
 import pyrogram
-from pyrogram.filters import Filter
+from pyrogram.filters import Filter, CompiledFilter
 from pyrogram.types import Update
 
 
@@ -28,16 +27,19 @@ class Handler:
     def __init__(self, callback: Callable, filters: Filter = None):
         self.callback = callback
         self.filters = filters
+        self.compiled_filters = None
+        # Seconds an async callback is allowed to run for, overriding the one of the client
+        self.timeout = None
+
+    def compile_filters(self) -> CompiledFilter:
+        # Filters are compiled again in case they have been replaced since
+        if self.compiled_filters is None or self.compiled_filters.filter is not self.filters:
+            self.compiled_filters = CompiledFilter(self.filters)
+
+        return self.compiled_filters
 
     async def check(self, client: "pyrogram.Client", update: Update):
         if callable(self.filters):
-            if inspect.iscoroutinefunction(self.filters.__call__):
-                return await self.filters(client, update)
-            else:
-                return await client.loop.run_in_executor(
-                    client.executor,
-                    self.filters,
-                    client, update
-                )
+            return await self.compile_filters()(client, update)
 
         return True
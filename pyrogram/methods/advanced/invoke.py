@@ -86,4 +86,7 @@ class Invoke:
         await self.fetch_peers(getattr(r, "users", []))
         await self.fetch_peers(getattr(r, "chats", []))
 
+        if not self.no_updates:
+            await self.update_state.process_result(query, r)
+
         return r
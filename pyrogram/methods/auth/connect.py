@@ -38,6 +38,7 @@ class Connect:
             raise ConnectionError("Client is already connected")
 
         await self.load_session()
+        await self.update_state.load()
 
         self.session = Session(
             self, await self.storage.dc_id(),
@@ -43,6 +43,7 @@ class Terminate:
             await self.invoke(raw.functions.account.FinishTakeoutSession())
             log.info("Takeout session %s finished", self.takeout_id)
 
+        await self.update_state.stop()
         await self.storage.save()
         await self.dispatcher.stop()
 
@@ -51,6 +52,10 @@ class Terminate:
 
         self.media_sessions.clear()
 
+        if self.process_executor is not None:
+            self.process_executor.shutdown(wait=False)
+            self.process_executor = None
+
         self.updates_watchdog_event.set()
 
         if self.updates_watchdog_task is not None:
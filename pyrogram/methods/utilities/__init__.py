@@ -18,22 +18,26 @@
 
 from .add_handler import AddHandler
 from .export_session_string import ExportSessionString
+from .get_metrics import GetMetrics
 from .remove_handler import RemoveHandler
 from .restart import Restart
 from .run import Run
 from .start import Start
 from .stop import Stop
 from .stop_transmission import StopTransmission
+from .wait_for import WaitFor
 
 
 class Utilities(
     AddHandler,
     ExportSessionString,
+    GetMetrics,
     RemoveHandler,
     Restart,
     Run,
     Start,
     Stop,
-    StopTransmission
+    StopTransmission,
+    WaitFor
 ):
     pass
@@ -34,6 +34,8 @@ class AddHandler:
         == higher priority). This mechanism is explained in greater details at
         :doc:`More on Updates <../../topics/more-on-updates>`.
 
+        The handler is in effect as soon as this method returns, updates being handled meanwhile are not affected.
+
         Parameters:
             handler (``Handler``):
                 The handler to be registered.
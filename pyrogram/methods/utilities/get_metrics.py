@@ -0,0 +1,58 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import pyrogram
+
+
+class GetMetrics:
+    def get_metrics(
+        self: "pyrogram.Client"
+    ) -> dict:
+        """Get the metrics of the update pipeline, from the connection to the handlers.
+
+        Durations are aggregated in histograms, one for each stage updates go through: *receive* (from the packet
+        being read off the connection to its decryption starting), *decrypt*, *handle_updates* (storing peers, tracking
+        the update state and queueing), *queue* (waiting in the updates queue), *parse*, *filter* (all the filters
+        checked for an update), *callback* (all the callbacks called for an update) and *total* (from the packet being
+        received to the update being handled). Each histogram has its cumulative counts by bucket upper bound in
+        seconds, along with the count and sum of all durations, ready to be exported to Prometheus.
+
+        Returns:
+            ``dict``: The histograms by stage, under *"stages"*, the state of the updates queue, under *"queue"*
+            (see *dispatcher.queue_stats*), and the timings of the handlers that have been called, under *"handlers"*
+            (see *dispatcher.handler_stats*), each one along with its handler type and callback name.
+
+        Example:
+            .. code-block:: python
+
+                metrics = app.get_metrics()
+
+                total = metrics["stages"]["total"]
+                print(total["sum"] / total["count"], metrics["queue"]["depths"])
+
+                for handler in metrics["handlers"]:
+                    print(handler["callback"], handler["p99"], handler["timeouts"])
+        """
+        return {
+            "stages": self.metrics.to_dict(),
+            "queue": self.dispatcher.queue_stats,
+            "handlers": [
+                {"handler": type(handler).__name__, "callback": handler.callback.__qualname__, **stats}
+                for handler, stats in self.dispatcher.handler_stats.items()
+            ]
+        }
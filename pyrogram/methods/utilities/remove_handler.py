@@ -31,6 +31,7 @@ class RemoveHandler:
 
         Make sure to provide the right group where the handler was added in. You can use the return value of the
         :meth:`~pyrogram.Client.add_handler` method, a tuple of *(handler, group)*, and pass it directly.
+        The handler no longer receives updates as soon as this method returns.
 
         Parameters:
             handler (``Handler``):
@@ -65,7 +65,7 @@ class Start:
                 self.takeout_id = (await self.invoke(raw.functions.account.InitTakeoutSession())).id
                 log.info("Takeout session %s initiated", self.takeout_id)
 
-            await self.invoke(raw.functions.updates.GetState())
+            state = await self.invoke(raw.functions.updates.GetState())
         except (Exception, KeyboardInterrupt):
             await self.disconnect()
             raise
@@ -73,4 +73,7 @@ class Start:
             self.me = await self.get_me()
             await self.initialize()
 
+            if not self.no_updates:
+                await self.update_state.recover(state)
+
             return self
@@ -0,0 +1,114 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from typing import Union, Optional, Type
+
+import pyrogram
+from pyrogram import raw, utils
+from pyrogram.filters import Filter
+from pyrogram.handlers import MessageHandler
+from pyrogram.handlers.handler import Handler
+
+
+async def get_waiter_id(client: "pyrogram.Client", peer_id: Union[int, str, None]) -> Optional[int]:
+    if peer_id is None or isinstance(peer_id, int):
+        return peer_id
+
+    peer = await client.resolve_peer(peer_id)
+
+    if isinstance(peer, raw.types.InputPeerUser):
+        return peer.user_id
+
+    if isinstance(peer, raw.types.InputPeerChat):
+        return -peer.chat_id
+
+    if isinstance(peer, raw.types.InputPeerChannel):
+        return utils.get_channel_id(peer.channel_id)
+
+    return client.me.id
+
+
+class WaitFor:
+    async def wait_for(
+        self: "pyrogram.Client",
+        chat_id: Union[int, str] = None,
+        user_id: Union[int, str] = None,
+        filters: Filter = None,
+        timeout: float = None,
+        handler_type: Type[Handler] = MessageHandler
+    ):
+        """Wait for the next update coming from a chat and/or a user.
+
+        The update is delivered to a single pending call, and handlers don't receive it. The most specific calls are
+        tried first: those waiting for both its chat and user, then for its chat only, then for its user only and
+        finally for any update; calls equally specific are tried in the order they were made. Pending calls are indexed
+        by chat and user, so that any number of them can be waiting at the same time without slowing the handling of
+        the other updates down.
+
+        Waiting from within a handler keeps one of the workers busy until the update arrives. With *shards*, updates of
+        a chat are always handled by the same worker: wait for them in a separate task instead, for example with
+        :obj:`asyncio.create_task`.
+
+        Parameters:
+            chat_id (``int`` | ``str``, *optional*):
+                Unique identifier (int) or username (str) of the chat the update must come from.
+                Defaults to None (any chat).
+
+            user_id (``int`` | ``str``, *optional*):
+                Unique identifier (int) or username (str) of the user the update must come from.
+                Defaults to None (any user).
+
+            filters (:obj:`Filters`, *optional*):
+                Further filters the update must pass.
+
+            timeout (``float``, *optional*):
+                Seconds to wait before giving up. Defaults to None (wait forever).
+
+            handler_type (``type``, *optional*):
+                The kind of update to wait for, expressed as the handler class receiving it, for example
+                :obj:`~pyrogram.handlers.CallbackQueryHandler` to wait for a button press.
+                Defaults to :obj:`~pyrogram.handlers.MessageHandler`.
+
+        Returns:
+            The update, for example a :obj:`~pyrogram.types.Message` when waiting for messages.
+
+        Raises:
+            asyncio.TimeoutError: In case the timeout elapses first.
+
+        Example:
+            .. code-block:: python
+
+                from pyrogram import filters
+
+                @app.on_message(filters.command("name"))
+                async def ask_name(client, message):
+                    await message.reply("What's your name?")
+
+                    answer = await client.wait_for(message.chat.id, message.from_user.id, filters.text, timeout=60)
+                    await answer.reply(f"Hello, {answer.text}!")
+        """
+        chat_id = await get_waiter_id(self, chat_id)
+        user_id = await get_waiter_id(self, user_id)
+
+        waiter = self.dispatcher.add_waiter(handler_type, chat_id, user_id, filters)
+
+        try:
+            return await asyncio.wait_for(waiter[0], timeout)
+        finally:
+            self.dispatcher.remove_waiter(handler_type, chat_id, user_id, waiter)
@@ -0,0 +1,83 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+# Monotonic time the packet carrying the updates being handled was received at, inherited by the tasks handling them
+received_at = ContextVar("received_at", default=None)
+
+# Stages of the update pipeline, in order
+RECEIVE = "receive"  # From the packet being read off the connection to its decryption starting
+DECRYPT = "decrypt"  # Decryption of the packet, waiting for the crypto executor included
+HANDLE_UPDATES = "handle_updates"  # Storing peers, tracking the update state and queueing the updates
+QUEUE = "queue"  # Waiting in the updates queue
+PARSE = "parse"  # Parsing raw updates into high-level ones
+FILTER = "filter"  # Checking the filters of the handlers
+CALLBACK = "callback"  # Running the handlers' callbacks
+TOTAL = "total"  # From the packet being received to the update being handled
+
+STAGES = (RECEIVE, DECRYPT, HANDLE_UPDATES, QUEUE, PARSE, FILTER, CALLBACK, TOTAL)
+
+
+class Histogram:
+    """Counts of durations falling within a set of buckets, in the fashion of Prometheus histograms."""
+
+    # Upper bounds of the buckets, in seconds
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        # One more for durations beyond the last bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        buckets = {}
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class Metrics:
+    """Durations of the stages every update goes through, from the connection to the handlers.
+
+    Timestamps are taken with the monotonic clock, stages are observed as soon as they are over.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+
+    def observe(self, stage: str, value: float):
+        self.histograms[stage].observe(value)
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}
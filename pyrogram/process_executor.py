@@ -0,0 +1,118 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import inspect
+import logging
+import multiprocessing
+from concurrent.futures.process import ProcessPoolExecutor
+from typing import Callable, List, Tuple
+
+import pyrogram
+from pyrogram.types import Object
+
+log = logging.getLogger(__name__)
+
+
+def run_in_process(func: Callable) -> Callable:
+    """Mark a handler callback to be executed in a separate process.
+
+    Useful for CPU-bound callbacks, which would otherwise hold the GIL and slow down every other handler. The callback
+    runs in the client's process pool and receives a snapshot of the update. It must be defined at the top level of a
+    module, so that worker processes are able to import it.
+
+    The client passed to the callback only records the methods called on it, including the ones called through
+    bound methods such as :meth:`~pyrogram.types.Message.reply`. They are invoked in order by the actual client
+    once the callback is done, hence their results are not available to the callback (they always return None).
+
+    Example:
+        .. code-block:: python
+
+            from pyrogram import Client, filters, run_in_process
+
+            app = Client("my_account")
+
+            @app.on_message(filters.photo)
+            @run_in_process
+            def classify(client, message):
+                message.reply(heavy_computation(message))
+    """
+    func.run_in_process = True
+
+    return func
+
+
+class ActionRecorder:
+    """Stands in for the client in worker processes, recording the methods called on it."""
+
+    def __init__(self, me: "pyrogram.types.User" = None):
+        self.me = me
+        self.actions: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not callable(getattr(pyrogram.Client, name, None)):
+            raise AttributeError(f"Client method {name} is not available in worker processes")
+
+        async def record(*args, **kwargs):
+            self.actions.append((name, args, kwargs))
+
+        return record
+
+
+def bind(obj, client):
+    if isinstance(obj, Object):
+        obj.bind(client)
+    elif isinstance(obj, list):
+        for o in obj:
+            bind(o, client)
+
+
+def create_executor(workers: int = None) -> ProcessPoolExecutor:
+    # Workers are spawned rather than forked: forking a process running the event loop and other threads would copy
+    # the locks those threads hold, as well as the running loop
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def run_callback(callback: Callable, args: tuple, me: "pyrogram.types.User" = None) -> List[Tuple[str, tuple, dict]]:
+    """Run a callback in a worker process and return the client methods it called."""
+    recorder = ActionRecorder(me)
+
+    for arg in args:
+        bind(arg, recorder)
+
+    result = callback(recorder, *args)
+
+    if inspect.iscoroutine(result):
+        asyncio.run(result)
+
+    return recorder.actions
+
+
+async def execute(client: "pyrogram.Client", callback: Callable, *args):
+    """Run a callback in the client's process pool and invoke the client methods it called."""
+    if client.process_executor is None:
+        client.process_executor = create_executor(client.process_workers)
+
+    actions = await client.loop.run_in_executor(
+        client.process_executor,
+        run_callback,
+        callback, args, client.me
+    )
+
+    for name, action_args, action_kwargs in actions:
+        await getattr(client, name)(*action_args, **action_kwargs)
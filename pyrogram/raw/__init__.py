@@ -16,11 +16,5 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
-from importlib import import_module
-
 from . import types, functions, base, core
-from .all import objects
-
-for k, v in objects.items():
-    path, name = v.rsplit(".", 1)
-    objects[k] = getattr(import_module(path), name)
+from .core.tl_object import objects
@@ -16,9 +16,12 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
+from . import archive
 from .future_salt import FutureSalt
 from .future_salts import FutureSalts
 from .gzip_packed import GzipPacked
+from .intern import Intern
+from .lazy_list import LazyList
 from .list import List
 from .message import Message
 from .msg_container import MsgContainer
@@ -28,4 +31,5 @@ from .primitives.double import Double
 from .primitives.int import Int, Long, Int128, Int256
 from .primitives.string import String
 from .primitives.vector import Vector
+from .rpc_result import RpcResult
 from .tl_object import TLObject
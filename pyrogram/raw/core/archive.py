@@ -0,0 +1,84 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from base64 import b64encode
+from json import JSONEncoder, loads
+from typing import Any, BinaryIO, Iterable, Iterator
+
+from .tl_object import TLObject
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ["json", "msgpack"]
+
+
+def encode_bytes(value: Any) -> str:
+    if isinstance(value, bytes):
+        return b64encode(value).decode()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def check_format(format: str) -> None:
+    if format not in FORMATS:
+        raise ValueError(f"Unknown archive format: {format!r}. Use one of {FORMATS}")
+
+    if format == "msgpack" and msgpack is None:
+        raise ImportError("The msgpack format requires the msgpack package: pip install msgpack")
+
+
+def dump(objects: Iterable[TLObject], file: BinaryIO, format: str = "json") -> int:
+    """Write raw objects to a binary file, either as JSON lines or as a stream of msgpack maps.
+
+    Objects are converted with their generated ``to_dict`` methods. In JSON, bytes are stored as base64 strings.
+
+    Returns:
+        ``int``: The number of objects written.
+    """
+    check_format(format)
+
+    if format == "json":
+        encode = JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=encode_bytes).encode
+        lines = (f"{encode(obj.to_dict())}\n".encode() for obj in objects)
+    else:
+        pack = msgpack.Packer(use_bin_type=True).pack
+        lines = (pack(obj.to_dict()) for obj in objects)
+
+    count = 0
+
+    for line in lines:
+        file.write(line)
+        count += 1
+
+    return count
+
+
+def load(file: BinaryIO, format: str = "json") -> Iterator[TLObject]:
+    """Read back the raw objects written by :meth:`dump`, one at a time."""
+    check_format(format)
+
+    if format == "json":
+        items = (loads(line) for line in file if line.strip())
+    else:
+        items = msgpack.Unpacker(file, raw=False)
+
+    for item in items:
+        yield TLObject.from_dict(item)
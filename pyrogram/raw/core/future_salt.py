@@ -43,11 +43,7 @@ class FutureSalt(TLObject):
 
         return FutureSalt(valid_since, valid_until, salt)
 
-    def write(self, *args: Any) -> bytes:
-        b = BytesIO()
-
-        b.write(Int(self.valid_since))
-        b.write(Int(self.valid_until))
-        b.write(Long(self.salt))
-
-        return b.getvalue()
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Int(self.valid_since)
+        b += Int(self.valid_until)
+        b += Long(self.salt)
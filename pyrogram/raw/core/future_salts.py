@@ -46,18 +46,14 @@ class FutureSalts(TLObject):
 
         return FutureSalts(req_msg_id, now, salts)
 
-    def write(self, *args: Any) -> bytes:
-        b = BytesIO()
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Int(self.ID, False)
 
-        b.write(Int(self.ID, False))
-
-        b.write(Long(self.req_msg_id))
-        b.write(Int(self.now))
+        b += Long(self.req_msg_id)
+        b += Int(self.now)
 
         count = len(self.salts)
-        b.write(Int(count))
+        b += Int(count)
 
         for salt in self.salts:
-            b.write(salt.write())
-
-        return b.getvalue()
+            salt.write_to(b)
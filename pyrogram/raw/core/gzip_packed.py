@@ -43,20 +43,20 @@ class GzipPacked(TLObject):
                 decompress(
                     Bytes.read(data)
                 )
-            )
+            ),
+            *args
         ))
 
-    def write(self, *args: Any) -> bytes:
-        b = BytesIO()
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        Bytes.skip(data)
 
-        b.write(Int(self.ID, False))
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Int(self.ID, False)
 
-        b.write(
-            Bytes(
-                compress(
-                    self.packed_data.write()
-                )
+        Bytes.write_to(
+            b,
+            compress(
+                self.packed_data.write()
             )
         )
-
-        return b.getvalue()
@@ -0,0 +1,58 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Any, Dict
+
+from .tl_object import TLObject
+
+
+class Intern:
+    """Shared copies of values that repeat across many updates, such as peers, names and reaction emoticons.
+
+    Interning is disabled by default and applies process-wide once enabled with ``Intern.ENABLED = True``.
+    Decoded peers are then shared between every object referencing them and must be treated as immutable.
+    """
+
+    ENABLED = False
+    CAPACITY = 100_000
+
+    store: Dict[Any, Any] = {}
+
+    @classmethod
+    def get(cls, key: Any, value: Any) -> Any:
+        result = cls.store.setdefault(key, value)
+
+        # Values can be decoded from more than one thread, clearing is the only eviction that is safe without a lock
+        if result is value and len(cls.store) > cls.CAPACITY:
+            cls.store.clear()
+
+        return result
+
+    @classmethod
+    def string(cls, value: str) -> str:
+        if not cls.ENABLED:
+            return value
+
+        return cls.get(value, value)
+
+    @classmethod
+    def object(cls, value: TLObject) -> Any:
+        if not cls.ENABLED:
+            return value
+
+        return cls.get((value.ID, *[getattr(value, attr) for attr in value.__slots__]), value)
@@ -0,0 +1,95 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+from typing import Any, Optional
+
+from .list import List
+from .tl_object import TLObject
+
+
+def loads(name: str):
+    method = getattr(List, name)
+
+    def wrapper(self: "LazyList", *args: Any, **kwargs: Any) -> Any:
+        for i in (self, *args):
+            if isinstance(i, LazyList) and i.data is not None:
+                i.load()
+
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+
+    return wrapper
+
+
+class LazyList(List):
+    """Vector of large objects (users, chats, messages) kept as raw bytes until first accessed.
+
+    Lazy decoding is disabled by default and applies process-wide once enabled with ``LazyList.ENABLED = True``.
+    Vectors are located by skipping over their contents, which is much cheaper than building every object in them.
+    """
+
+    ENABLED = False
+
+    __slots__ = ["data", "type"]
+
+    def __init__(self, data: bytes, t: Any = None):
+        super().__init__()
+
+        self.data: Optional[bytes] = data
+        self.type = t
+
+    @classmethod
+    def read(cls, b: BytesIO, t: Any = None, *args: Any) -> List:
+        if not cls.ENABLED:
+            return TLObject.read(b, t)
+
+        start = b.tell()
+
+        try:
+            TLObject.skip(b, t)
+        except Exception:
+            # Layouts that can't be skipped are simply decoded right away
+            b.seek(start)
+            return TLObject.read(b, t)
+
+        end = b.tell()
+        b.seek(start)
+
+        return cls(b.read(end - start), t)
+
+    def load(self) -> None:
+        data, self.data = self.data, None
+        List.extend(self, TLObject.read(BytesIO(data), self.type))
+
+    def __reduce__(self):
+        return List, (list(self),)
+
+    def __radd__(self, other: list) -> list:
+        return other + list(self)
+
+
+# Every list method first decodes the pending items, so that the inherited implementation sees them
+for name in [
+    "__len__", "__iter__", "__reversed__", "__contains__", "__getitem__", "__setitem__", "__delitem__",
+    "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__", "__add__", "__iadd__", "__mul__", "__imul__",
+    "__repr__", "__str__", "append", "extend", "insert", "pop", "remove", "clear", "copy", "index", "count",
+    "reverse", "sort"
+]:
+    setattr(LazyList, name, loads(name))
@@ -45,12 +45,13 @@ class Message(TLObject):
 
         return Message(TLObject.read(BytesIO(body)), msg_id, seq_no, length)
 
-    def write(self, *args: Any) -> bytes:
-        b = BytesIO()
-
-        b.write(Long(self.msg_id))
-        b.write(Int(self.seq_no))
-        b.write(Int(self.length))
-        b.write(self.body.write())
-
-        return b.getvalue()
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        data.seek(12, 1)
+        data.seek(Int.read(data), 1)
+
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Long(self.msg_id)
+        b += Int(self.seq_no)
+        b += Int(self.length)
+        self.body.write_to(b)
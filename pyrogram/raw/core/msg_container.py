@@ -39,15 +39,11 @@ class MsgContainer(TLObject):
         count = Int.read(data)
         return MsgContainer([Message.read(data) for _ in range(count)])
 
-    def write(self, *args: Any) -> bytes:
-        b = BytesIO()
-
-        b.write(Int(self.ID, False))
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Int(self.ID, False)
 
         count = len(self.messages)
-        b.write(Int(count))
+        b += Int(count)
 
         for message in self.messages:
-            b.write(message.write())
-
-        return b.getvalue()
+            message.write_to(b)
@@ -30,6 +30,10 @@ class BoolFalse(bytes, TLObject):
     def read(cls, *args: Any) -> bool:
         return cls.value
 
+    @staticmethod
+    def skip(*args: Any) -> None:
+        pass
+
     def __new__(cls) -> bytes:  # type: ignore
         return cls.ID.to_bytes(4, "little")
 
@@ -44,5 +48,9 @@ class Bool(bytes, TLObject):
     def read(cls, data: BytesIO, *args: Any) -> bool:
         return int.from_bytes(data.read(4), "little") == BoolTrue.ID
 
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        data.seek(4, 1)
+
     def __new__(cls, value: bool) -> bytes:  # type: ignore
         return BoolTrue() if value else BoolFalse()
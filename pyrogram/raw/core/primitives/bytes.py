@@ -16,8 +16,9 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
+from base64 import b64decode
 from io import BytesIO
-from typing import Any
+from typing import Any, Union
 
 from ..tl_object import TLObject
 
@@ -37,6 +38,35 @@ class Bytes(bytes, TLObject):
 
         return x
 
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        length = int.from_bytes(data.read(1), "little")
+
+        if length <= 253:
+            data.seek(length + -(length + 1) % 4, 1)
+        else:
+            length = int.from_bytes(data.read(3), "little")
+            data.seek(length + -length % 4, 1)
+
+    @staticmethod
+    def from_value(value: Union[bytes, str]) -> bytes:
+        # Bytes are kept as they are in dicts, but come back as base64 strings from JSON archives
+        return b64decode(value) if isinstance(value, str) else value
+
+    @staticmethod
+    def write_to(b: bytearray, value: bytes) -> None:  # type: ignore
+        length = len(value)
+
+        if length <= 253:
+            b.append(length)
+            b += value
+            b += bytes(-(length + 1) % 4)
+        else:
+            b.append(254)
+            b += length.to_bytes(3, "little")
+            b += value
+            b += bytes(-length % 4)
+
     def __new__(cls, value: bytes) -> bytes:  # type: ignore
         length = len(value)
 
@@ -28,5 +28,9 @@ class Double(bytes, TLObject):
     def read(cls, data: BytesIO, *args: Any) -> float:
         return cast(float, unpack("d", data.read(8))[0])
 
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        data.seek(8, 1)
+
     def __new__(cls, value: float) -> bytes:  # type: ignore
         return pack("d", value)
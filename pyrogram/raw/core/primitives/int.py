@@ -29,6 +29,10 @@ class Int(bytes, TLObject):
     def read(cls, data: BytesIO, signed: bool = True, *args: Any) -> int:
         return int.from_bytes(data.read(cls.SIZE), "little", signed=signed)
 
+    @classmethod
+    def skip(cls, data: BytesIO, *args: Any) -> None:
+        data.seek(cls.SIZE, 1)
+
     def __new__(cls, value: int, signed: bool = True) -> bytes:  # type: ignore
         return value.to_bytes(cls.SIZE, "little", signed=signed)
 
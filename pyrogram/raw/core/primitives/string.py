@@ -27,5 +27,9 @@ class String(Bytes):
     def read(cls, data: BytesIO, *args) -> str:  # type: ignore
         return cast(bytes, super(String, String).read(data)).decode(errors="replace")
 
+    @staticmethod
+    def write_to(b: bytearray, value: str) -> None:  # type: ignore
+        Bytes.write_to(b, value.encode())
+
     def __new__(cls, value: str) -> bytes:  # type: ignore
         return super().__new__(cls, value.encode())
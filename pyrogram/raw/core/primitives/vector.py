@@ -17,7 +17,7 @@
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
 from io import BytesIO
-from typing import cast, Union, Any
+from typing import Union, Any
 
 from .int import Int, Long
 from ..list import List
@@ -27,8 +27,8 @@ from ..tl_object import TLObject
 class Vector(bytes, TLObject):
     ID = 0x1CB5C415
 
-    # Method added to handle the special case when a query returns a bare Vector (of Ints);
-    # i.e., RpcResult body starts with 0x1cb5c415 (Vector Id) - e.g., messages.GetMessagesViews.
+    # Method added to handle the special case when a bare Vector is read without knowing its element type.
+    # Generated code always passes the type, this is only a fallback for manual TLObject.read calls.
     @staticmethod
     def read_bare(b: BytesIO, size: int) -> Union[int, Any]:
         if size == 4:
@@ -42,18 +42,45 @@ class Vector(bytes, TLObject):
     @classmethod
     def read(cls, data: BytesIO, t: Any = None, *args: Any) -> List:
         count = Int.read(data)
-        left = len(data.read())
+
+        if t:
+            return List(t.read(data) for _ in range(count))
+
+        # Measure the remaining bytes by seeking instead of reading (and copying) them
+        position = data.tell()
+        left = data.seek(0, 2) - position
+        data.seek(position)
+
         size = (left / count) if count else 0
-        data.seek(-left, 1)
 
-        return List(
-            t.read(data) if t
-            else Vector.read_bare(data, size)
-            for _ in range(count)
-        )
+        return List(Vector.read_bare(data, size) for _ in range(count))
+
+    @staticmethod
+    def skip(data: BytesIO, t: Any = None, *args: Any) -> None:
+        if t is None:
+            raise ValueError("Vectors can only be skipped when their element type is known")
+
+        count = Int.read(data)
+
+        if hasattr(t, "SIZE"):
+            data.seek(count * t.SIZE, 1)
+        else:
+            for _ in range(count):
+                t.skip(data)
+
+    @staticmethod
+    def write_to(b: bytearray, value: list, t: Any = None) -> None:  # type: ignore
+        b += Int(Vector.ID, False)
+        b += Int(len(value))
+
+        if t:
+            for i in value:
+                b += t(i)
+        else:
+            for i in value:
+                i.write_to(b)
 
     def __new__(cls, value: list, t: Any = None) -> bytes:  # type: ignore
-        return b"".join(
-            [Int(cls.ID, False), Int(len(value))]
-            + [cast(bytes, t(i)) if t else i.write() for i in value]
-        )
+        b = bytearray()
+        Vector.write_to(b, value, t)
+        return bytes(b)
@@ -0,0 +1,59 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+from typing import Any
+
+from .primitives.int import Int, Long
+from .tl_object import TLObject
+
+
+class RpcResult(TLObject):
+    ID = 0xF35C6D01  # hex(crc32(b"rpc_result req_msg_id:long result:Object = RpcResult"))
+
+    __slots__ = ["req_msg_id", "result"]
+
+    QUALNAME = "RpcResult"
+
+    def __init__(self, req_msg_id: int, result: Any):
+        self.req_msg_id = req_msg_id
+        self.result = result
+
+    @staticmethod
+    def read(data: BytesIO, *args: Any) -> "RpcResult":
+        req_msg_id = Long.read(data)
+
+        # The result is left undecoded: its type depends on the query it answers, which only the session that sent
+        # it knows about (see TLObject.read_result). The enclosing Message already bounds data to this result.
+        return RpcResult(req_msg_id, data.read())
+
+    @staticmethod
+    def skip(data: BytesIO, *args: Any) -> None:
+        # Unlike reading, skipping doesn't rely on the enclosing Message and stops right after the result. Bare vectors
+        # can't be skipped this way, their element type is only known to the query (see Vector.skip)
+        data.seek(8, 1)
+        TLObject.skip(data)
+
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        b += Int(self.ID, False)
+        b += Long(self.req_msg_id)
+
+        if isinstance(self.result, bytes):
+            b += self.result
+        else:
+            self.result.write_to(b)
@@ -16,11 +16,58 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
+from importlib import import_module
 from io import BytesIO
 from json import dumps
 from typing import cast, List, Any, Union, Dict
 
-from ..all import objects
+from ..all import objects as paths
+
+
+class Objects(Dict[int, Any]):
+    """Map of constructor IDs to classes, importing each class the first time its ID is looked up."""
+
+    def __missing__(self, key: int) -> Any:
+        path, name = paths[key].rsplit(".", 1)
+        value = self[key] = getattr(import_module(path), name)
+
+        return value
+
+
+class Qualnames(Dict[str, Any]):
+    """Map of qualified names (as in the "_" key of dicts) to classes, imported the first time they are looked up."""
+
+    def __missing__(self, key: str) -> Any:
+        # Hand-written objects live in the core package and have no namespace in their names
+        path = f"pyrogram.raw.{key}" if "." in key else f"pyrogram.raw.core.{key}"
+        path, name = path.rsplit(".", 1)
+        value = self[key] = getattr(import_module(path), name)
+
+        return value
+
+
+def dict_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [dict_value(i) for i in value]
+
+    if isinstance(value, TLObject) and not isinstance(value, bytes):
+        return value.to_dict()
+
+    return value
+
+
+def object_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [object_value(i) for i in value]
+
+    if isinstance(value, dict) and "_" in value:
+        return TLObject.from_dict(value)
+
+    return value
+
+
+objects = Objects()
+qualnames = Qualnames()
 
 
 class TLObject:
@@ -32,23 +79,54 @@ class TLObject:
     def read(cls, b: BytesIO, *args: Any) -> Any:
         return cast(TLObject, objects[int.from_bytes(b.read(4), "little")]).read(b, *args)
 
+    @classmethod
+    def skip(cls, b: BytesIO, *args: Any) -> None:
+        # Move past a boxed object without building it. Generated types override this with their own layout,
+        # hand-written core objects without a layout of their own are read and discarded
+        if cls is not TLObject:
+            cls.read(b, *args)
+            return
+
+        objects[int.from_bytes(b.read(4), "little")].skip(b, *args)
+
+    def read_result(self, b: BytesIO, *args: Any) -> Any:
+        # Functions returning bare vectors or wrapping other queries override this with the exact result type
+        return TLObject.read(b)
+
     def write(self, *args: Any) -> bytes:
-        pass
+        b = bytearray()
+        self.write_to(b, *args)
+        return bytes(b)
 
-    @staticmethod
-    def default(obj: "TLObject") -> Union[str, Dict[str, str]]:
-        if isinstance(obj, bytes):
-            return repr(obj)
+    def write_to(self, b: bytearray, *args: Any) -> None:
+        # Objects that only implement write() are still serializable in place
+        b += self.write(*args)
 
+    def to_dict(self) -> Dict[str, Any]:
+        # Generated types access their slots directly, this covers the hand-written core objects
         return {
-            "_": obj.QUALNAME,
+            "_": self.QUALNAME,
             **{
-                attr: getattr(obj, attr)
-                for attr in obj.__slots__
-                if getattr(obj, attr) is not None
+                attr: dict_value(getattr(self, attr))
+                for attr in self.__slots__
+                if getattr(self, attr) is not None
             }
         }
 
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> Any:
+        if cls is TLObject:
+            return qualnames[d["_"]].from_dict(d)
+
+        return cls(**{k: object_value(v) for k, v in d.items() if k != "_"})
+
+    @staticmethod
+    def default(obj: "TLObject") -> Union[str, Dict[str, Any]]:
+        if isinstance(obj, bytes):
+            return repr(obj)
+
+        return obj.to_dict()
+
     def __str__(self) -> str:
         return dumps(self, indent=4, default=TLObject.default, ensure_ascii=False)
 
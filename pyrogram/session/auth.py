@@ -47,11 +47,13 @@ class Auth:
 
     @staticmethod
     def pack(data: TLObject) -> bytes:
+        body = data.write()
+
         return (
             bytes(8)
             + Long(MsgId())
-            + Int(len(data.write()))
-            + data.write()
+            + Int(len(body))
+            + body
         )
 
     @staticmethod
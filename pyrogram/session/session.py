@@ -20,11 +20,12 @@ import asyncio
 import bisect
 import logging
 import os
+import time
 from hashlib import sha1
 from io import BytesIO
 
 import pyrogram
-from pyrogram import raw
+from pyrogram import raw, metrics
 from pyrogram.connection import Connection
 from pyrogram.crypto import mtproto
 from pyrogram.errors import (
@@ -32,15 +33,17 @@ from pyrogram.errors import (
     SecurityCheckMismatch
 )
 from pyrogram.raw.all import layer
-from pyrogram.raw.core import TLObject, MsgContainer, Int, FutureSalts
+from pyrogram.raw.core import TLObject, MsgContainer, Int, FutureSalts, RpcResult
 from .internals import MsgId, MsgFactory
 
 log = logging.getLogger(__name__)
 
 
 class Result:
-    def __init__(self):
+    def __init__(self, query: TLObject):
+        self.query = query
         self.value = None
+        self.error = None
         self.event = asyncio.Event()
 
 
@@ -183,7 +186,15 @@ class Session:
         await self.stop()
         await self.start()
 
-    async def handle_packet(self, packet):
+    async def handle_packet(self, packet, received_at: float = None):
+        started_at = time.monotonic()
+
+        if received_at is not None:
+            self.client.metrics.observe(metrics.RECEIVE, started_at - received_at)
+
+            # Tasks spawned from here on, handling the updates of this packet included, know when it was received
+            metrics.received_at.set(received_at)
+
         data = await self.loop.run_in_executor(
             pyrogram.crypto_executor,
             mtproto.unpack,
@@ -193,6 +204,8 @@ class Session:
             self.auth_key_id
         )
 
+        self.client.metrics.observe(metrics.DECRYPT, time.monotonic() - started_at)
+
         messages = (
             data.body.messages
             if isinstance(data.body, MsgContainer)
@@ -246,7 +259,7 @@ class Session:
 
             if isinstance(msg.body, (raw.types.BadMsgNotification, raw.types.BadServerSalt)):
                 msg_id = msg.body.bad_msg_id
-            elif isinstance(msg.body, (FutureSalts, raw.types.RpcResult)):
+            elif isinstance(msg.body, (FutureSalts, RpcResult)):
                 msg_id = msg.body.req_msg_id
             elif isinstance(msg.body, raw.types.Pong):
                 msg_id = msg.body.msg_id
@@ -255,8 +268,23 @@ class Session:
                     self.loop.create_task(self.client.handle_updates(msg.body))
 
             if msg_id in self.results:
-                self.results[msg_id].value = getattr(msg.body, "result", msg.body)
-                self.results[msg_id].event.set()
+                result = self.results[msg_id]
+
+                if isinstance(msg.body, RpcResult):
+                    try:
+                        # Results can be large (e.g.: histories, differences), decode them away from the event loop
+                        result.value = await self.loop.run_in_executor(
+                            pyrogram.crypto_executor,
+                            result.query.read_result,
+                            BytesIO(msg.body.result)
+                        )
+                    except Exception as e:
+                        log.exception(e)
+                        result.error = e
+                else:
+                    result.value = msg.body
+
+                result.event.set()
 
         if len(self.pending_acks) >= self.ACKS_THRESHOLD:
             log.debug("Sending %s acks", len(self.pending_acks))
@@ -310,7 +338,7 @@ class Session:
 
                 break
 
-            self.loop.create_task(self.handle_packet(packet))
+            self.loop.create_task(self.handle_packet(packet, time.monotonic()))
 
         log.info("NetworkTask stopped")
 
@@ -319,7 +347,7 @@ class Session:
         msg_id = message.msg_id
 
         if wait_response:
-            self.results[msg_id] = Result()
+            self.results[msg_id] = Result(data)
 
         log.debug("Sent: %s", message)
 
@@ -345,7 +373,12 @@ class Session:
             except asyncio.TimeoutError:
                 pass
 
-            result = self.results.pop(msg_id).value
+            result = self.results.pop(msg_id)
+
+            if result.error is not None:
+                raise result.error
+
+            result = result.value
 
             if result is None:
                 raise TimeoutError("Request timed out")
@@ -22,6 +22,7 @@ import sqlite3
 from pathlib import Path
 
 from .sqlite_storage import SQLiteStorage
+from .sqlite_thread import SQLiteThread
 
 log = logging.getLogger(__name__)
 
@@ -49,9 +50,24 @@ class FileStorage(SQLiteStorage):
 
             version += 1
 
+        if version == 3:
+            with self.conn:
+                self.conn.execute("""
+                    CREATE TABLE update_state
+                    (
+                        id   INTEGER PRIMARY KEY,
+                        pts  INTEGER,
+                        qts  INTEGER,
+                        date INTEGER,
+                        seq  INTEGER
+                    );
+                """)
+
+            version += 1
+
         self.version(version)
 
-    async def open(self):
+    def connect(self):
         path = self.database
         file_exists = path.is_file()
 
@@ -65,5 +81,16 @@ class FileStorage(SQLiteStorage):
         with self.conn:
             self.conn.execute("VACUUM")
 
+    async def open(self):
+        # Session files live on disk, which can be slow: keep the connection away from the event loop
+        self.thread = SQLiteThread(self.name)
+
+        try:
+            await self.run(self.connect)
+        except Exception:
+            await self.thread.stop()
+            self.thread = None
+            raise
+
     async def delete(self):
         os.remove(self.database)
@@ -16,15 +16,20 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
 
-import inspect
+import asyncio
+import logging
 import sqlite3
 import time
-from typing import List, Tuple, Any
+from collections import OrderedDict
+from typing import List, Tuple, Any, Optional, Callable, Dict, Union
 
 from pyrogram import raw
+from .sqlite_thread import SQLiteThread
 from .storage import Storage
 from .. import utils
 
+log = logging.getLogger(__name__)
+
 # language=SQLite
 SCHEMA = """
 CREATE TABLE sessions
@@ -48,6 +53,15 @@ CREATE TABLE peers
     last_update_on INTEGER NOT NULL DEFAULT (CAST(STRFTIME('%s', 'now') AS INTEGER))
 );
 
+CREATE TABLE update_state
+(
+    id   INTEGER PRIMARY KEY,
+    pts  INTEGER,
+    qts  INTEGER,
+    date INTEGER,
+    seq  INTEGER
+);
+
 CREATE TABLE version
 (
     number INTEGER PRIMARY KEY
@@ -90,13 +104,29 @@ def get_input_peer(peer_id: int, access_hash: int, peer_type: str):
 
 
 class SQLiteStorage(Storage):
-    VERSION = 3
+    VERSION = 4
     USERNAME_TTL = 8 * 60 * 60
 
+    SESSION_COLUMNS = ("dc_id", "api_id", "test_mode", "auth_key", "date", "user_id", "is_bot")
+
+    # Number of peers remembered in order to skip writing the ones that didn't change
+    PEERS_CACHE_SIZE = 100000
+    # Seconds changed peers are held back for, in order to write them in batches
+    PEERS_FLUSH_INTERVAL = 1
+
     def __init__(self, name: str):
         super().__init__(name)
 
         self.conn = None  # type: sqlite3.Connection
+        # In-memory copy of the session row, loaded on first access and written through
+        self.session: Optional[dict] = None
+        # The thread the connection is used from, if any, otherwise it's used right away from the event loop
+        self.thread: Optional[SQLiteThread] = None
+
+        # Most recently seen peers, as (row, time written at) by ID, and the rows waiting to be written
+        self.peers: OrderedDict = OrderedDict()
+        self.pending_peers: Dict[int, Tuple[int, int, str, str, str]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
 
     def create(self):
         with self.conn:
@@ -112,31 +142,136 @@ class SQLiteStorage(Storage):
                 (2, None, None, None, 0, None, None)
             )
 
+    async def run(self, func: Callable, *args) -> Any:
+        if self.thread is None:
+            return func(*args)
+
+        return await self.thread.run(func, *args)
+
+    def fetchone(self, query: str, parameters: tuple = ()) -> Optional[tuple]:
+        return self.conn.execute(query, parameters).fetchone()
+
+    def fetchall(self, query: str, parameters: tuple = ()) -> List[tuple]:
+        return self.conn.execute(query, parameters).fetchall()
+
+    def commit(self, query: str, parameters: tuple = ()):
+        with self.conn:
+            self.conn.execute(query, parameters)
+
+    def commit_many(self, query: str, parameters: List[tuple]):
+        with self.conn:
+            self.conn.executemany(query, parameters)
+
     async def open(self):
         raise NotImplementedError
 
     async def save(self):
+        await self.flush_peers()
         await self.date(int(time.time()))
-        self.conn.commit()
+        await self.run(self.conn.commit)
 
     async def close(self):
-        self.conn.close()
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+
+        await self.flush_peers()
+        await self.run(self.conn.close)
+
+        self.session = None
+        self.peers.clear()
+
+        if self.thread is not None:
+            await self.thread.stop()
+            self.thread = None
 
     async def delete(self):
         raise NotImplementedError
 
     async def update_peers(self, peers: List[Tuple[int, int, str, str, str]]):
-        self.conn.executemany(
-            "REPLACE INTO peers (id, access_hash, type, username, phone_number)"
-            "VALUES (?, ?, ?, ?, ?)",
-            peers
-        )
+        now = time.time()
+
+        for peer in peers:
+            peer_id = peer[0]
+            known = self.peers.get(peer_id)
+
+            # Rows are written again once in a while even if unchanged, so that usernames don't expire
+            if known is None or known[0] != peer or now - known[1] > self.USERNAME_TTL / 2:
+                self.pending_peers[peer_id] = peer
+                self.peers[peer_id] = (peer, now)
+
+            self.peers.move_to_end(peer_id)
+
+        while len(self.peers) > self.PEERS_CACHE_SIZE:
+            self.peers.popitem(last=False)
+
+        if self.pending_peers and self.flush_task is None:
+            self.flush_task = asyncio.get_event_loop().create_task(self.flush_peers_later())
+
+    async def flush_peers_later(self):
+        await asyncio.sleep(self.PEERS_FLUSH_INTERVAL)
+
+        self.flush_task = None
+
+        try:
+            await self.flush_peers()
+        except Exception as e:
+            # The peers are still pending, they are written by the next flush
+            log.exception(e)
+
+    async def flush_peers(self):
+        """Write the peers that changed since the last time, in a single transaction."""
+        if not self.pending_peers:
+            return
+
+        peers, self.pending_peers = self.pending_peers, {}
+
+        try:
+            await self.run(
+                self.commit_many,
+                "REPLACE INTO peers (id, access_hash, type, username, phone_number)"
+                "VALUES (?, ?, ?, ?, ?)",
+                list(peers.values())
+            )
+        except BaseException:
+            # Put the peers back unless they changed in the meantime, the newer rows are the ones to write
+            self.pending_peers = {**peers, **self.pending_peers}
+            raise
+
+    async def update_state(self, value: Union[int, List[Tuple[int, int, int, int, int]]] = object):
+        if value == object:
+            return await self.run(
+                self.fetchall,
+                "SELECT id, pts, qts, date, seq FROM update_state"
+            )
+        elif isinstance(value, int):
+            await self.run(
+                self.commit,
+                "DELETE FROM update_state WHERE id = ?",
+                (value,)
+            )
+        else:
+            await self.run(
+                self.commit_many,
+                "REPLACE INTO update_state (id, pts, qts, date, seq)"
+                "VALUES (?, ?, ?, ?, ?)",
+                value
+            )
 
     async def get_peer_by_id(self, peer_id: int):
-        r = self.conn.execute(
+        known = self.pending_peers.get(peer_id)
+
+        if known is None and peer_id in self.peers:
+            known = self.peers[peer_id][0]
+
+        if known is not None:
+            return get_input_peer(*known[:3])
+
+        r = await self.run(
+            self.fetchone,
             "SELECT id, access_hash, type FROM peers WHERE id = ?",
             (peer_id,)
-        ).fetchone()
+        )
 
         if r is None:
             raise KeyError(f"ID not found: {peer_id}")
@@ -144,11 +279,14 @@ class SQLiteStorage(Storage):
         return get_input_peer(*r)
 
     async def get_peer_by_username(self, username: str):
-        r = self.conn.execute(
+        await self.flush_peers()
+
+        r = await self.run(
+            self.fetchone,
             "SELECT id, access_hash, type, last_update_on FROM peers WHERE username = ?"
             "ORDER BY last_update_on DESC",
             (username,)
-        ).fetchone()
+        )
 
         if r is None:
             raise KeyError(f"Username not found: {username}")
@@ -159,55 +297,64 @@ class SQLiteStorage(Storage):
         return get_input_peer(*r[:3])
 
     async def get_peer_by_phone_number(self, phone_number: str):
-        r = self.conn.execute(
+        await self.flush_peers()
+
+        r = await self.run(
+            self.fetchone,
             "SELECT id, access_hash, type FROM peers WHERE phone_number = ?",
             (phone_number,)
-        ).fetchone()
+        )
 
         if r is None:
             raise KeyError(f"Phone number not found: {phone_number}")
 
         return get_input_peer(*r)
 
-    def _get(self):
-        attr = inspect.stack()[2].function
+    async def _get(self, column: str):
+        if self.session is None:
+            row = await self.run(
+                self.fetchone,
+                f"SELECT {', '.join(self.SESSION_COLUMNS)} FROM sessions"
+            )
 
-        return self.conn.execute(
-            f"SELECT {attr} FROM sessions"
-        ).fetchone()[0]
+            self.session = dict(zip(self.SESSION_COLUMNS, row))
 
-    def _set(self, value: Any):
-        attr = inspect.stack()[2].function
+        return self.session[column]
 
-        with self.conn:
-            self.conn.execute(
-                f"UPDATE sessions SET {attr} = ?",
-                (value,)
-            )
+    async def _set(self, column: str, value: Any):
+        await self.run(
+            self.commit,
+            f"UPDATE sessions SET {column} = ?",
+            (value,)
+        )
+
+        if self.session is not None:
+            # Kept the way SQLite stores it, booleans are read back as integers
+            self.session[column] = int(value) if isinstance(value, bool) else value
 
-    def _accessor(self, value: Any = object):
-        return self._get() if value == object else self._set(value)
+    async def _accessor(self, column: str, value: Any = object):
+        return await self._get(column) if value == object else await self._set(column, value)
 
     async def dc_id(self, value: int = object):
-        return self._accessor(value)
+        return await self._accessor("dc_id", value)
 
     async def api_id(self, value: int = object):
-        return self._accessor(value)
+        return await self._accessor("api_id", value)
 
     async def test_mode(self, value: bool = object):
-        return self._accessor(value)
+        return await self._accessor("test_mode", value)
 
     async def auth_key(self, value: bytes = object):
-        return self._accessor(value)
+        return await self._accessor("auth_key", value)
 
     async def date(self, value: int = object):
-        return self._accessor(value)
+        return await self._accessor("date", value)
 
     async def user_id(self, value: int = object):
-        return self._accessor(value)
+        return await self._accessor("user_id", value)
 
     async def is_bot(self, value: bool = object):
-        return self._accessor(value)
+        return await self._accessor("is_bot", value)
 
     def version(self, value: int = object):
         if value == object:
@@ -0,0 +1,76 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+import queue
+import threading
+from typing import Callable, Any
+
+log = logging.getLogger(__name__)
+
+
+def set_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+def set_exception(future: asyncio.Future, exception: BaseException):
+    if not future.done():
+        future.set_exception(exception)
+
+
+class SQLiteThread:
+    """A dedicated thread a SQLite connection is used from, so that disk I/O never blocks the event loop.
+
+    Operations are queued and run one at a time, in the order they have been requested, and their results are handed
+    back to the event loop that requested them.
+    """
+
+    def __init__(self, name: str):
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.worker, name=f"Storage-{name}", daemon=True)
+        self.thread.start()
+
+    def worker(self):
+        while True:
+            loop, future, func, args = self.requests.get()
+
+            if func is None:
+                loop.call_soon_threadsafe(set_result, future, None)
+                break
+
+            try:
+                result = func(*args)
+            except BaseException as e:
+                loop.call_soon_threadsafe(set_exception, future, e)
+            else:
+                loop.call_soon_threadsafe(set_result, future, result)
+
+    async def run(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        self.requests.put((loop, future, func, args))
+
+        return await future
+
+    async def stop(self):
+        # Operations already requested are run before the thread stops, which only has to exit once this is resolved
+        await self.run(None)
+        self.thread.join()
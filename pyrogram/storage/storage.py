@@ -18,7 +18,7 @@
 
 import base64
 import struct
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 
 class Storage:
@@ -47,6 +47,9 @@ class Storage:
     async def update_peers(self, peers: List[Tuple[int, int, str, str, str]]):
         raise NotImplementedError
 
+    async def update_state(self, value: Union[int, List[Tuple[int, int, int, int, int]]] = object):
+        raise NotImplementedError
+
     async def get_peer_by_id(self, peer_id: int):
         raise NotImplementedError
 
@@ -0,0 +1,659 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import pyrogram
+from pyrogram import raw, utils
+from pyrogram.errors import ChannelPrivate, ChannelInvalid, PeerIdInvalid
+
+log = logging.getLogger(__name__)
+
+# Boxes of the common update sequences, channel boxes are identified by their channel ID
+PTS = "pts"
+QTS = "qts"
+SEQ = "seq"
+
+Box = Union[str, int]
+
+
+class UpdateState:
+    """Tracks the update sequences of the account in order to apply updates exactly once and in order.
+
+    The common message box (pts), the secondary box (qts), the updates sequence (seq) and the pts of every channel
+    are persisted in the storage. Updates arriving after a gap are held back for a short while, and in case the
+    missing ones don't show up, the difference is fetched from the server and dispatched in their place. The same
+    happens on start, so that updates sent while the client was offline are not lost.
+    """
+
+    # Seconds to wait for the updates filling a gap before asking the server for the difference
+    GAP_TIMEOUT = 0.5
+    # Seconds changes to the boxes are held back for before being written to the storage
+    SAVE_INTERVAL = 1
+
+    CHANNEL_DIFFERENCE_LIMIT = 100
+    CHANNEL_DIFFERENCE_LIMIT_BOT = 100000
+
+    CHANNEL_UPDATES = (
+        raw.types.UpdateNewChannelMessage,
+        raw.types.UpdateEditChannelMessage,
+        raw.types.UpdateDeleteChannelMessages,
+        raw.types.UpdateChannelWebPage,
+        raw.types.UpdatePinnedChannelMessages
+    )
+
+    SHORT_MESSAGE_UPDATES = (raw.types.UpdateShortMessage, raw.types.UpdateShortChatMessage)
+
+    # Number of users and chats kept in memory to build the messages short updates lack
+    PEERS_CACHE_SIZE = 10000
+
+    AFFECTED_RESULTS = (
+        raw.types.UpdateShortSentMessage,
+        raw.types.messages.AffectedMessages,
+        raw.types.messages.AffectedHistory,
+        raw.types.messages.AffectedFoundMessages
+    )
+
+    def __init__(self, client: "pyrogram.Client"):
+        self.client = client
+
+        self.pts: Optional[int] = None
+        self.qts: Optional[int] = None
+        self.date: Optional[int] = None
+        self.seq: Optional[int] = None
+        self.channels: Dict[int, int] = {}
+
+        # Updates received ahead of a gap: (pts before, pts after, update, users, chats, dispatch)
+        self.pending: Dict[Box, List[Tuple[int, int, object, dict, dict, bool]]] = {}
+        # The seq the account must reach before the gap found in the updates sequence is considered filled
+        self.pending_seq: Optional[int] = None
+
+        self.gap_tasks: Dict[Box, asyncio.Task] = {}
+        self.difference_locks: Dict[Box, asyncio.Lock] = {}
+        # Boxes whose difference is being fetched, their updates are held back until it has been applied
+        self.fetching = set()
+
+        # Boxes changed since they were last written, 0 stands for the common ones
+        self.unsaved = set()
+        self.save_task: Optional[asyncio.Task] = None
+
+        # Most recently seen users and chats, by their raw ID
+        self.users: OrderedDict = OrderedDict()
+        self.chats: OrderedDict = OrderedDict()
+
+    def cache_peers(self, peers: List[Union["raw.types.User", "raw.types.Chat", "raw.types.Channel"]]):
+        for peer in peers:
+            # Min peers carry partial information and must not replace the full ones
+            if getattr(peer, "min", False):
+                continue
+
+            cache = self.users if isinstance(peer, raw.types.User) else self.chats
+            cache[peer.id] = peer
+            cache.move_to_end(peer.id)
+
+            if len(cache) > self.PEERS_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    async def load(self):
+        self.pts = self.qts = self.date = self.seq = None
+        self.channels.clear()
+
+        for box_id, pts, qts, date, seq in await self.client.storage.update_state():
+            if box_id == 0:
+                self.pts, self.qts, self.date, self.seq = pts, qts, date, seq
+            else:
+                self.channels[box_id] = pts
+
+    async def recover(self, state: "raw.types.updates.State"):
+        """Catch up with the updates sent while the client was offline, or start tracking from the given state."""
+        if self.pts is None or self.qts is None or self.date is None:
+            await self.set_state(state)
+        else:
+            await self.get_difference()
+
+    async def stop(self):
+        for task in self.gap_tasks.values():
+            task.cancel()
+
+        self.gap_tasks.clear()
+        self.pending.clear()
+        self.pending_seq = None
+
+        if self.save_task is not None:
+            self.save_task.cancel()
+            self.save_task = None
+
+        await self.write()
+
+    def get(self, box: Box) -> Optional[int]:
+        if box == PTS:
+            return self.pts
+
+        if box == QTS:
+            return self.qts
+
+        return self.channels.get(box)
+
+    async def set(self, box: Box, value: int):
+        if box == PTS:
+            self.pts = value
+        elif box == QTS:
+            self.qts = value
+        else:
+            self.channels[box] = value
+
+        await self.save(box)
+
+    async def save(self, box: Box = PTS):
+        # Writes are held back and batched, the common boxes share a single row
+        self.unsaved.add(0 if box in (PTS, QTS, SEQ) else box)
+
+        if self.save_task is None:
+            self.save_task = self.client.loop.create_task(self.save_later())
+
+    async def save_later(self):
+        await asyncio.sleep(self.SAVE_INTERVAL)
+
+        self.save_task = None
+        await self.write()
+
+    async def write(self):
+        """Write the boxes changed since the last time to the storage, in a single transaction."""
+        boxes, self.unsaved = self.unsaved, set()
+
+        rows = [
+            (0, self.pts, self.qts, self.date, self.seq) if box == 0
+            else (box, self.channels[box], None, None, None)
+            for box in boxes
+            # Channels might have stopped being tracked meanwhile
+            if box == 0 or box in self.channels
+        ]
+
+        if rows:
+            await self.client.storage.update_state(rows)
+
+    async def set_state(self, state: "raw.types.updates.State"):
+        self.pts, self.qts, self.date, self.seq = state.pts, state.qts, state.date, state.seq
+        await self.save()
+
+    @staticmethod
+    def get_channel_id(update) -> Optional[int]:
+        return getattr(
+            getattr(
+                getattr(
+                    update, "message", None
+                ), "peer_id", None
+            ), "channel_id", None
+        ) or getattr(update, "channel_id", None)
+
+    def get_box(self, update) -> Optional[Tuple[Box, int, int]]:
+        """Get the box an update belongs to, along with the box value expected before and after applying it."""
+        pts = getattr(update, "pts", None)
+        pts_count = getattr(update, "pts_count", None)
+
+        if pts is not None and pts_count is not None:
+            if isinstance(update, self.CHANNEL_UPDATES):
+                channel_id = self.get_channel_id(update)
+
+                # Empty messages carry no peer, there's no way to tell which channel they belong to
+                if channel_id is None:
+                    return None
+
+                return channel_id, pts - pts_count, pts
+
+            return PTS, pts - pts_count, pts
+
+        qts = getattr(update, "qts", None)
+
+        if qts is not None:
+            return QTS, qts - 1, qts
+
+        return None
+
+    async def process(self, update, users: dict, chats: dict, dispatch: bool = True):
+        """Apply an update, holding it back in case it comes after a gap and dropping it in case it's a duplicate."""
+        if isinstance(update, raw.types.UpdateChannelTooLong):
+            if update.channel_id in self.channels:
+                self.schedule(update.channel_id, 0)
+            elif update.pts is not None:
+                # Start tracking the channel from the point the server says it was left at
+                await self.set(update.channel_id, update.pts)
+                self.schedule(update.channel_id, 0)
+            else:
+                # Nothing tells where the channel was left at, hence what's missing
+                log.debug("Ignoring too long channel never tracked: %s", update.channel_id)
+
+        box = self.get_box(update)
+
+        if box is None:
+            if dispatch:
+                await self.dispatch(update, users, chats)
+
+            return
+
+        await self.process_box(*box, update, users, chats, dispatch)
+
+    async def process_box(self, box: Box, before: int, after: int, update, users: dict, chats: dict, dispatch: bool):
+        local = self.get(box)
+
+        if box not in self.fetching:
+            if local is None or local == before:
+                await self.apply(box, after, update, users, chats, dispatch)
+                return
+
+            if local > before:
+                log.debug("Skipping duplicate update: %s %s > %s", box, local, before)
+                return
+
+            log.debug("Gap detected: %s %s < %s", box, local, before)
+
+        self.pending.setdefault(box, []).append((before, after, update, users, chats, dispatch))
+        self.schedule(box)
+
+    async def process_seq(self, updates: Union["raw.types.Updates", "raw.types.UpdatesCombined"]) -> bool:
+        """Check the updates sequence of an updates container. Returns False in case it has already been applied."""
+        seq_start = getattr(updates, "seq_start", updates.seq)
+
+        if seq_start == 0 or self.seq is None or self.seq + 1 == seq_start:
+            if updates.seq != 0:
+                self.seq, self.date = updates.seq, updates.date
+                await self.save(SEQ)
+
+            return True
+
+        if self.seq + 1 > seq_start:
+            return False
+
+        # The updates are applied anyway, their pts is checked on its own. Only the unordered ones can be missing
+        self.pending_seq = max(self.pending_seq or 0, seq_start - 1)
+        self.schedule(SEQ)
+
+        return True
+
+    async def process_result(self, query, result):
+        """Apply the updates contained in the result of a query, without dispatching them."""
+        if isinstance(query, raw.functions.InvokeWithTakeout):
+            query = query.query
+
+        if isinstance(result, (raw.types.Updates, raw.types.UpdatesCombined)):
+            if await self.process_seq(result):
+                for update in result.updates:
+                    await self.process(update, {}, {}, False)
+        elif isinstance(result, raw.types.UpdateShort):
+            await self.process(result.update, {}, {}, False)
+        elif isinstance(result, self.AFFECTED_RESULTS):
+            box = self.get_query_box(query)
+
+            if box is not None:
+                await self.process_box(box, result.pts - result.pts_count, result.pts, result, {}, {}, False)
+
+    @staticmethod
+    def get_query_box(query) -> Optional[Box]:
+        """Get the box affected messages belong to out of the query, None in case there's no way to tell."""
+        # Affected messages don't tell which box they belong to, but the peer or channel the query acts on does
+        channel = getattr(query, "channel", None)
+
+        if channel is not None:
+            return getattr(channel, "channel_id", None)
+
+        peer = getattr(query, "peer", None)
+
+        if peer is None:
+            # Queries acting on messages by ID only (e.g.: messages.DeleteMessages) are about the common box
+            return PTS
+
+        if isinstance(peer, (raw.types.InputPeerChannel, raw.types.InputPeerChannelFromMessage)):
+            return peer.channel_id
+
+        if isinstance(peer, (
+            raw.types.InputPeerSelf,
+            raw.types.InputPeerUser,
+            raw.types.InputPeerUserFromMessage,
+            raw.types.InputPeerChat
+        )):
+            return PTS
+
+        return None
+
+    async def apply(self, box: Box, after: int, update, users: dict, chats: dict, dispatch: bool):
+        await self.set(box, after)
+
+        if dispatch:
+            await self.dispatch(update, users, chats)
+
+        pending = self.pending.get(box)
+        released = []
+
+        # Updates held back might follow the one just applied
+        while pending:
+            pending.sort(key=lambda i: i[0])
+            before, after, update, users, chats, dispatch_held = pending[0]
+            local = self.get(box)
+
+            if local < before:
+                break
+
+            pending.pop(0)
+
+            if local == before:
+                await self.set(box, after)
+
+                if dispatch_held:
+                    if dispatch:
+                        await self.dispatch(update, users, chats)
+                    else:
+                        released.append((update, users, chats))
+
+        if not pending:
+            self.pending.pop(box, None)
+
+        if released:
+            # Applied out of the result of a query, which might have been invoked by a handler: waiting here for room
+            # in a full queue would wait for the very workers the handler is keeping busy
+            self.client.loop.create_task(self.dispatch_all(released))
+
+    async def dispatch_all(self, packets: List[tuple]):
+        for packet in packets:
+            await self.dispatch(*packet)
+
+    async def dispatch(self, update, users: dict, chats: dict):
+        if isinstance(update, self.SHORT_MESSAGE_UPDATES):
+            local = self.build_short_message(update)
+
+            if local is not None:
+                await self.client.dispatcher.updates_queue.put(local)
+            else:
+                self.client.loop.create_task(self.dispatch_short_message(update))
+        else:
+            await self.client.dispatcher.updates_queue.put((update, users, chats))
+
+    def build_short_message(
+        self,
+        update: Union["raw.types.UpdateShortMessage", "raw.types.UpdateShortChatMessage"]
+    ) -> Optional[Tuple["raw.types.UpdateNewMessage", dict, dict]]:
+        """Build the full message of a short update out of the cached peers, None in case any of them is unknown."""
+        if isinstance(update, raw.types.UpdateShortMessage):
+            peer_id = raw.types.PeerUser(user_id=update.user_id)
+            if update.out and self.client.me is None:
+                return None
+
+            from_id = raw.types.PeerUser(user_id=self.client.me.id if update.out else update.user_id)
+        else:
+            peer_id = raw.types.PeerChat(chat_id=update.chat_id)
+            from_id = raw.types.PeerUser(user_id=update.from_id)
+
+        peers = [peer_id, from_id]
+
+        if update.via_bot_id:
+            peers.append(raw.types.PeerUser(user_id=update.via_bot_id))
+
+        if update.fwd_from and update.fwd_from.from_id:
+            peers.append(update.fwd_from.from_id)
+
+        for entity in update.entities or []:
+            if isinstance(entity, raw.types.MessageEntityMentionName):
+                peers.append(raw.types.PeerUser(user_id=entity.user_id))
+
+        users = {}
+        chats = {}
+
+        for peer in peers:
+            if isinstance(peer, raw.types.PeerUser):
+                cache, result, raw_id = self.users, users, peer.user_id
+            elif isinstance(peer, raw.types.PeerChat):
+                cache, result, raw_id = self.chats, chats, peer.chat_id
+            else:
+                cache, result, raw_id = self.chats, chats, peer.channel_id
+
+            if raw_id not in cache:
+                return None
+
+            result[raw_id] = cache[raw_id]
+
+        message = raw.types.Message(
+            id=update.id,
+            peer_id=peer_id,
+            date=update.date,
+            message=update.message,
+            out=update.out,
+            mentioned=update.mentioned,
+            media_unread=update.media_unread,
+            silent=update.silent,
+            from_id=from_id,
+            fwd_from=update.fwd_from,
+            via_bot_id=update.via_bot_id,
+            reply_to=update.reply_to,
+            # Same as messages read from the wire, which have absent vectors empty
+            entities=update.entities or [],
+            restriction_reason=[],
+            ttl_period=update.ttl_period
+        )
+
+        return raw.types.UpdateNewMessage(message=message, pts=update.pts, pts_count=update.pts_count), users, chats
+
+    async def dispatch_short_message(self, update: Union["raw.types.UpdateShortMessage", "raw.types.UpdateShortChatMessage"]):
+        # Some of the peers are unknown, fetch the message in full from the point right before it
+        try:
+            diff = await self.client.invoke(
+                raw.functions.updates.GetDifference(
+                    pts=update.pts - update.pts_count,
+                    date=update.date,
+                    qts=-1
+                )
+            )
+        except Exception as e:
+            log.exception(e)
+            return
+
+        if isinstance(diff, (raw.types.updates.DifferenceEmpty, raw.types.updates.DifferenceTooLong)):
+            return
+
+        if diff.new_messages:
+            await self.client.dispatcher.updates_queue.put((
+                raw.types.UpdateNewMessage(
+                    message=diff.new_messages[0],
+                    pts=update.pts,
+                    pts_count=update.pts_count
+                ),
+                {u.id: u for u in diff.users},
+                {c.id: c for c in diff.chats}
+            ))
+        elif diff.other_updates:  # The other_updates list can be empty
+            await self.client.dispatcher.updates_queue.put((diff.other_updates[0], {}, {}))
+
+    def schedule(self, box: Box, timeout: float = None):
+        if box not in self.gap_tasks:
+            self.gap_tasks[box] = self.client.loop.create_task(
+                self.wait_gap(box, self.GAP_TIMEOUT if timeout is None else timeout)
+            )
+
+    async def wait_gap(self, box: Box, timeout: float):
+        try:
+            await asyncio.sleep(timeout)
+        finally:
+            self.gap_tasks.pop(box, None)
+
+        if box == SEQ:
+            if self.pending_seq is not None and self.seq is not None and self.seq < self.pending_seq:
+                await self.get_difference()
+
+            self.pending_seq = None
+        elif box in (PTS, QTS):
+            if self.pending.get(box):
+                await self.get_difference()
+        elif timeout == 0 or self.pending.get(box):
+            await self.get_channel_difference(box)
+
+    async def get_difference(self):
+        """Fetch and dispatch the updates of the common boxes the client has missed."""
+        lock = self.difference_locks.setdefault(PTS, asyncio.Lock())
+
+        async with lock:
+            self.fetching.update((PTS, QTS))
+
+            try:
+                while True:
+                    if self.pts is None or self.qts is None or self.date is None:
+                        await self.set_state(await self.client.invoke(raw.functions.updates.GetState()))
+                        break
+
+                    diff = await self.client.invoke(
+                        raw.functions.updates.GetDifference(
+                            pts=self.pts,
+                            date=self.date,
+                            qts=self.qts
+                        )
+                    )
+
+                    if isinstance(diff, raw.types.updates.DifferenceEmpty):
+                        self.date, self.seq = diff.date, diff.seq
+                        await self.save(SEQ)
+                        break
+
+                    if isinstance(diff, raw.types.updates.DifferenceTooLong):
+                        self.pts = diff.pts
+                        await self.save()
+                        continue
+
+                    users = {u.id: u for u in diff.users}
+                    chats = {c.id: c for c in diff.chats}
+                    state = (
+                        diff.state
+                        if isinstance(diff, raw.types.updates.Difference)
+                        else diff.intermediate_state
+                    )
+
+                    log.info("Fetched the difference: %s messages, %s updates",
+                             len(diff.new_messages), len(diff.other_updates))
+
+                    for message in diff.new_messages:
+                        if isinstance(getattr(message, "peer_id", None), raw.types.PeerChannel):
+                            update = raw.types.UpdateNewChannelMessage(message=message, pts=state.pts, pts_count=0)
+                        else:
+                            update = raw.types.UpdateNewMessage(message=message, pts=state.pts, pts_count=0)
+
+                        await self.dispatch(update, users, chats)
+
+                    for update in diff.other_updates:
+                        # Channel updates are still ordered by their own channel box
+                        if isinstance(update, self.CHANNEL_UPDATES + (raw.types.UpdateChannelTooLong,)):
+                            await self.process(update, users, chats)
+                        else:
+                            await self.dispatch(update, users, chats)
+
+                    await self.set_state(state)
+
+                    if isinstance(diff, raw.types.updates.Difference):
+                        break
+            except Exception as e:
+                log.exception(e)
+            finally:
+                self.fetching.difference_update((PTS, QTS))
+
+            for box in (PTS, QTS):
+                await self.flush(box)
+
+    async def get_channel_difference(self, channel_id: int):
+        """Fetch and dispatch the updates of a channel the client has missed."""
+        lock = self.difference_locks.setdefault(channel_id, asyncio.Lock())
+
+        async with lock:
+            self.fetching.add(channel_id)
+
+            try:
+                if channel_id not in self.channels:
+                    # There's no point to fetch the difference from
+                    return
+
+                peer = await self.client.resolve_peer(utils.get_channel_id(channel_id))
+                channel = raw.types.InputChannel(channel_id=peer.channel_id, access_hash=peer.access_hash)
+
+                limit = (
+                    self.CHANNEL_DIFFERENCE_LIMIT_BOT
+                    if await self.client.storage.is_bot()
+                    else self.CHANNEL_DIFFERENCE_LIMIT
+                )
+
+                while True:
+                    diff = await self.client.invoke(
+                        raw.functions.updates.GetChannelDifference(
+                            channel=channel,
+                            filter=raw.types.ChannelMessagesFilterEmpty(),
+                            pts=self.channels[channel_id],
+                            limit=limit
+                        )
+                    )
+
+                    if isinstance(diff, raw.types.updates.ChannelDifferenceEmpty):
+                        await self.set(channel_id, diff.pts)
+                        break
+
+                    users = {u.id: u for u in diff.users}
+                    chats = {c.id: c for c in diff.chats}
+
+                    if isinstance(diff, raw.types.updates.ChannelDifferenceTooLong):
+                        messages, other_updates, pts = diff.messages, [], diff.dialog.pts
+                    else:
+                        messages, other_updates, pts = diff.new_messages, diff.other_updates, diff.pts
+
+                    for message in messages:
+                        await self.dispatch(
+                            raw.types.UpdateNewChannelMessage(message=message, pts=pts, pts_count=0),
+                            users, chats
+                        )
+
+                    for update in other_updates:
+                        await self.dispatch(update, users, chats)
+
+                    await self.set(channel_id, pts)
+
+                    if diff.final:
+                        break
+            except (ChannelPrivate, ChannelInvalid, PeerIdInvalid):
+                # The channel is no longer reachable, stop tracking it
+                self.channels.pop(channel_id, None)
+                self.pending.pop(channel_id, None)
+                await self.client.storage.update_state(channel_id)
+            except Exception as e:
+                log.exception(e)
+            finally:
+                self.fetching.discard(channel_id)
+
+            await self.flush(channel_id)
+
+    async def flush(self, box: Box):
+        """Reapply the updates held back during a difference, most of them are now duplicates.
+
+        The server has just been asked for everything missing, hence any update still ahead of the box is applied
+        as it is instead of looking for a gap once again.
+        """
+        pending = self.pending.pop(box, [])
+
+        for before, after, update, users, chats, dispatch in sorted(pending, key=lambda i: i[0]):
+            local = self.get(box)
+
+            if local is not None and local >= after:
+                continue
+
+            await self.set(box, after)
+
+            if dispatch:
+                await self.dispatch(update, users, chats)
@@ -146,3 +146,52 @@ async def test_no_text():
 
     m = Message()
     assert not await f(c, m)
+
+
+@pytest.mark.asyncio
+async def test_username_change():
+    client = Client()
+    f = filters.command("start")
+
+    assert await f(client, Message("/start@username"))
+
+    client.me.username = "another"
+
+    assert not await f(client, Message("/start@username"))
+    assert await f(client, Message("/start@another"))
+
+
+@pytest.mark.asyncio
+async def test_similar_commands():
+    f = filters.command(["start", "start_game", "st"])
+
+    m = Message("/start_game now")
+    assert await f(c, m)
+    assert m.command == ["start_game", "now"]
+
+    m = Message("/st")
+    assert await f(c, m)
+    assert m.command == ["st"]
+
+    m = Message("/sta")
+    assert not await f(c, m)
+
+
+@pytest.mark.asyncio
+async def test_commands_change():
+    f = filters.command("a")
+
+    assert await f(c, Message("/a"))
+
+    f.commands = {"b"}
+
+    assert await f(c, Message("/b"))
+    assert not await f(c, Message("/a"))
+
+
+@pytest.mark.asyncio
+async def test_prefixes_case_sensitive():
+    f = filters.command("start", prefixes="x")
+
+    assert await f(c, Message("xSTART"))
+    assert not await f(c, Message("Xstart"))
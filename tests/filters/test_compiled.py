@@ -0,0 +1,82 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+
+import pytest
+
+from pyrogram import filters
+from pyrogram.filters import CompiledFilter
+from tests.filters import Client, Message
+
+c = Client()
+
+
+async def truthy_filter(_, __, ___):
+    return True
+
+
+async def falsy_filter(_, __, ___):
+    return False
+
+
+truthy = filters.create(truthy_filter)
+falsy = filters.create(falsy_filter)
+
+
+@pytest.mark.asyncio
+async def test_matches_filters():
+    leaves = [filters.text, filters.caption, truthy, falsy, ~filters.text]
+
+    for a, b, d in itertools.product(leaves, repeat=3):
+        for flt in [a & b | d, a | ~(b & d), ~a & (b | d) & a, (a | b) | (d & a)]:
+            for m in [Message("text"), Message(caption="caption"), Message()]:
+                assert await CompiledFilter(flt)(c, m) == bool(await flt(c, m))
+
+
+@pytest.mark.asyncio
+async def test_flatten_and_inline():
+    compiled = CompiledFilter(filters.text & filters.caption & ~filters.text & truthy)
+
+    assert compiled.flatten(compiled.filter, filters.AndFilter) == [
+        filters.text, filters.caption, compiled.filter.base.other, truthy
+    ]
+    assert CompiledFilter(filters.text & ~filters.caption).root.is_async is False
+    assert CompiledFilter(filters.text & truthy).root.is_async is True
+
+
+@pytest.mark.asyncio
+async def test_reorder():
+    calls = []
+
+    async def slow_filter(_, __, ___):
+        calls.append("slow")
+        return True
+
+    CompiledFilter.REORDER, CompiledFilter.REORDER_INTERVAL = True, 10
+
+    try:
+        compiled = CompiledFilter(filters.create(slow_filter) & falsy)
+
+        for _ in range(20):
+            assert await compiled(c, Message("text")) is False
+    finally:
+        CompiledFilter.REORDER, CompiledFilter.REORDER_INTERVAL = False, 1000
+
+    # Once reordered, the falsy filter short-circuits before the other one is evaluated
+    assert len(calls) < 20
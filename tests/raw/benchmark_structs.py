@@ -0,0 +1,127 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Compare reading and writing frequent small constructors with and without fused struct calls.
+
+The schema is compiled a second time, into a temporary directory, with every fixed-width field going through its own
+primitive as a baseline. Run from the repository root:
+
+    python -m tests.raw.benchmark_structs
+"""
+
+import importlib.util
+import sys
+import tempfile
+import timeit
+from io import BytesIO
+from pathlib import Path
+
+from compiler.api import compiler
+from pyrogram import raw
+
+ROUNDS = 20000
+REPEAT = 5
+
+
+def samples() -> list:
+    t = raw.types
+
+    return [
+        t.PeerUser(user_id=123456789),
+        t.PeerChannel(channel_id=1234567890),
+        t.PeerChat(chat_id=12345),
+        t.MessageEntityBold(offset=1, length=10),
+        t.MessageEntityItalic(offset=1, length=10),
+        t.MessageEntityMention(offset=1, length=10),
+        t.MessageEntityBotCommand(offset=0, length=6),
+        t.InputPeerChannel(channel_id=1234567890, access_hash=-987654321987),
+        t.InputPeerUser(user_id=123456789, access_hash=-987654321987),
+        t.UpdateUserStatus(user_id=123456789, status=t.UserStatusOnline(expires=1700000000)),
+        t.UserStatusOffline(was_online=1700000000),
+        t.UpdateReadHistoryOutbox(peer=t.PeerUser(user_id=1), max_id=100, pts=1000, pts_count=1),
+        t.UpdateReadChannelInbox(channel_id=1, max_id=100, still_unread_count=0, pts=1000),
+        t.UpdateReadChannelOutbox(channel_id=1, max_id=100),
+        t.UpdateDeleteMessages(messages=[1, 2, 3], pts=1000, pts_count=3),
+        t.UpdateChannelMessageViews(channel_id=1, id=100, views=1000),
+        t.UpdateChatUserTyping(chat_id=1, from_id=t.PeerUser(user_id=2), action=t.SendMessageTypingAction()),
+        t.UpdateUserTyping(user_id=1, action=t.SendMessageTypingAction()),
+        t.UpdateChannelUserTyping(channel_id=1, from_id=t.PeerUser(user_id=2), action=t.SendMessageTypingAction()),
+        t.UpdateReadChannelDiscussionInbox(channel_id=1, top_msg_id=10, read_max_id=100)
+    ]
+
+
+def compile_baseline(path: Path):
+    root = Path(__file__).parents[2]
+
+    compiler.HOME_PATH = root / "compiler" / "api"
+    compiler.DESTINATION_PATH = path
+    compiler.NOTICE_PATH = root / "NOTICE"
+    compiler.FUSE_FIXED_FIELDS = False
+
+    compiler.start()
+
+
+def load_baseline(path: Path, cls: type) -> type:
+    # Generated modules only use absolute imports, they can be loaded on their own
+    module_path = path.joinpath(*cls.__module__.split(".")[2:]).with_suffix(".py")
+    spec = importlib.util.spec_from_file_location(f"baseline.{cls.__module__}", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return getattr(module, cls.__name__)
+
+
+def measure(func) -> float:
+    return min(timeit.repeat(func, number=ROUNDS, repeat=REPEAT))
+
+
+def main():
+    objects = samples()
+    # Constructor IDs are left out, objects are read by their class like TLObject.read does after looking them up
+    data = [obj.write()[4:] for obj in objects]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compile_baseline(Path(tmp))
+        baseline = [load_baseline(Path(tmp), type(obj)) for obj in objects]
+
+    print(f"{'constructor':<36}{'read before':>14}{'read after':>14}{'write before':>14}{'write after':>14}")
+
+    totals = [0.0] * 4
+
+    for obj, b, cls in zip(objects, data, baseline):
+        timings = [
+            measure(lambda: cls.read(BytesIO(b))),
+            measure(lambda: type(obj).read(BytesIO(b))),
+            measure(lambda: cls.write_to(obj, bytearray())),
+            measure(lambda: obj.write_to(bytearray()))
+        ]
+
+        totals = [t + i for t, i in zip(totals, timings)]
+        rates = "".join(f"{ROUNDS / i / 1e3:>13.0f}k" for i in timings)
+
+        print(f"{type(obj).__name__:<36}{rates}")
+
+    count = ROUNDS * len(objects)
+    rates = "".join(f"{count / i / 1e3:>13.0f}k" for i in totals)
+
+    print(f"{'all (objects/s)':<36}{rates}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+from json import dumps
+
+import pytest
+
+from pyrogram import raw
+from pyrogram.raw.core import TLObject, archive
+
+
+def message(i: int = 1) -> raw.types.UpdateNewMessage:
+    return raw.types.UpdateNewMessage(
+        message=raw.types.Message(
+            id=i,
+            peer_id=raw.types.PeerUser(user_id=10),
+            date=1000 + i,
+            message=f"hello {i}",
+            out=True,
+            entities=[raw.types.MessageEntityBold(offset=0, length=5)],
+            media=raw.types.MessageMediaDocument(
+                document=raw.types.Document(
+                    id=i, access_hash=2, file_reference=b"\x00\xff" * i, date=3, mime_type="text/plain",
+                    size=4, dc_id=2, attributes=[]
+                )
+            )
+        ),
+        pts=i,
+        pts_count=1
+    )
+
+
+def test_to_dict():
+    d = message().to_dict()
+
+    assert d["_"] == "types.UpdateNewMessage"
+    assert d["message"]["peer_id"] == {"_": "types.PeerUser", "user_id": 10}
+    assert d["message"]["out"] is True
+    assert "reply_to" not in d["message"]
+    assert d["message"]["media"]["document"]["file_reference"] == b"\x00\xff"
+
+
+def test_from_dict():
+    update = message()
+    result = TLObject.from_dict(update.to_dict())
+
+    assert isinstance(result, raw.types.UpdateNewMessage)
+    assert result.write() == update.write()
+
+
+def test_str():
+    update = message()
+
+    assert '"_": "types.MessageEntityBold"' in str(update)
+    file_reference = dumps(repr(b"\x00\xff"))
+
+    assert f'"file_reference": {file_reference}' in str(update)
+
+
+@pytest.mark.parametrize("format", ["json", pytest.param("msgpack", marks=pytest.mark.skipif(
+    archive.msgpack is None, reason="msgpack is not installed"
+))])
+def test_dump_load(format):
+    updates = [message(i) for i in range(1, 4)]
+    file = BytesIO()
+
+    assert archive.dump(updates, file, format) == 3
+
+    file.seek(0)
+
+    assert [u.write() for u in archive.load(file, format)] == [u.write() for u in updates]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        archive.dump([], BytesIO(), "xml")
@@ -0,0 +1,63 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+
+import pytest
+
+from pyrogram import raw
+from pyrogram.raw.core import TLObject, Intern
+
+
+def user(i: int) -> bytes:
+    return raw.types.User(id=i, first_name="Name", lang_code="en").write()
+
+
+@pytest.fixture
+def intern():
+    Intern.ENABLED = True
+    yield
+    Intern.ENABLED = False
+    Intern.store.clear()
+
+
+def test_interned(intern):
+    peers = [TLObject.read(BytesIO(raw.types.PeerUser(user_id=1).write())) for _ in range(3)]
+    users = [TLObject.read(BytesIO(user(i))) for i in range(3)]
+
+    assert peers[0] is peers[1] is peers[2]
+    assert users[0].first_name is users[1].first_name is users[2].first_name
+    assert users[0].lang_code is users[2].lang_code
+    assert users[0] is not users[1]
+
+
+def test_capacity(intern, monkeypatch):
+    monkeypatch.setattr(Intern, "CAPACITY", 2)
+
+    for i in range(3):
+        TLObject.read(BytesIO(raw.types.PeerChannel(channel_id=i).write()))
+
+    assert len(Intern.store) == 0
+
+
+def test_disabled():
+    first, second = (TLObject.read(BytesIO(raw.types.PeerUser(user_id=1).write())) for _ in range(2))
+
+    assert first == second
+    assert first is not second
+    assert not Intern.store
@@ -0,0 +1,61 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import subprocess
+import sys
+
+from pyrogram import raw
+
+
+def run(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_import_is_lazy():
+    output = run(
+        "import sys, pyrogram; from pyrogram.raw.all import objects; "
+        "print(sum(m.startswith('pyrogram.raw.') for m in sys.modules) < len(objects) // 4, "
+        "'pyrogram.raw.types.help.config_simple' in sys.modules)"
+    )
+
+    assert output == "True False"
+
+
+def test_read_imports_on_first_use():
+    output = run(
+        "import sys, io; from pyrogram.raw.core import TLObject, Int; "
+        "config = TLObject.read(io.BytesIO(Int(0x5a592a6c, False) + Int(1) + Int(2) + Int(0x1cb5c415, False) + Int(0))); "
+        "print(type(config).__name__, config.expires, 'pyrogram.raw.types.help.config_simple' in sys.modules)"
+    )
+
+    assert output == "ConfigSimple 2 True"
+
+
+def test_namespace_access():
+    assert raw.types.PeerUser.ID == 0x59511722
+    assert raw.functions.messages.GetHistory.QUALNAME == "functions.messages.GetHistory"
+    assert raw.types.Updates.QUALNAME == "types.Updates"
+    assert raw.objects[raw.types.PeerUser.ID] is raw.types.PeerUser
+    assert "PeerUser" in raw.types.__all__
+
+    try:
+        raw.types.DoesNotExist
+    except AttributeError:
+        pass
+    else:
+        assert False
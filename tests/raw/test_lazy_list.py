@@ -0,0 +1,116 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+
+import pytest
+
+from pyrogram import raw
+from pyrogram.raw.core import TLObject, LazyList, Message, MsgContainer, FutureSalts, RpcResult, GzipPacked, Vector, Long
+
+
+def updates(count: int = 5) -> raw.types.Updates:
+    return raw.types.Updates(
+        updates=[raw.types.UpdateUserStatus(user_id=1, status=raw.types.UserStatusOnline(expires=2))],
+        users=[
+            raw.types.User(
+                id=i, access_hash=i * 2, first_name=f"User {i}", username=f"user{i}" if i % 2 else None,
+                photo=raw.types.UserProfilePhoto(photo_id=i, dc_id=2, stripped_thumb=b"\x01" * i),
+                bot=bool(i % 3), bot_info_version=i if i % 3 else None,
+                usernames=[raw.types.Username(username=f"u{i}", active=True)]
+            )
+            for i in range(count)
+        ],
+        chats=[raw.types.Channel(id=100, title="Channel", photo=raw.types.ChatPhotoEmpty(), date=3, access_hash=4)],
+        date=5,
+        seq=6
+    )
+
+
+@pytest.fixture
+def lazy():
+    LazyList.ENABLED = True
+    yield
+    LazyList.ENABLED = False
+
+
+def test_skip_matches_read():
+    result = updates()
+
+    for obj in [result, result.users[1], result.chats[0]]:
+        data = obj.write()
+        b = BytesIO(data)
+        TLObject.skip(b)
+
+        assert b.tell() == len(data)
+
+
+def test_lazy_vectors(lazy):
+    data = updates().write()
+    result = TLObject.read(BytesIO(data))
+
+    assert isinstance(result.users, LazyList)
+    assert result.users.data is not None
+    assert result.date == 5 and result.seq == 6
+
+    assert len(result.users) == 5
+    assert result.users.data is None
+    assert [u.first_name for u in result.users] == [f"User {i}" for i in range(5)]
+    assert result.chats[0].title == "Channel"
+    assert result.write() == data
+    assert result == TLObject.read(BytesIO(data))
+    assert '"User 4"' in str(result)
+
+
+def test_lazy_disabled():
+    result = TLObject.read(BytesIO(updates().write()))
+
+    assert not isinstance(result.users, LazyList)
+
+
+def test_skip_core_objects():
+    message = Message(raw.types.Pong(msg_id=1, ping_id=2), msg_id=3, seq_no=4, length=20)
+
+    for obj in [
+        MsgContainer([message, message]),
+        FutureSalts(req_msg_id=1, now=2, salts=[]),
+        GzipPacked(raw.types.Pong(msg_id=1, ping_id=2))
+    ]:
+        # Skipping an object moves exactly as far as reading it does
+        data = obj.write() + b"\x00" * 4
+        read, skipped = BytesIO(data), BytesIO(data)
+        TLObject.read(read)
+        TLObject.skip(skipped)
+
+        assert skipped.tell() == read.tell()
+
+    # Results are read up to the end of their message, but skipping them leaves whatever follows unread
+    data = RpcResult(req_msg_id=1, result=raw.types.Pong(msg_id=1, ping_id=2)).write()
+    b = BytesIO(data + message.write())
+    TLObject.skip(b)
+
+    assert b.tell() == len(data)
+
+    # The elements of bare vectors are only known to the query, they can't be told apart from what follows
+    with pytest.raises(ValueError):
+        TLObject.skip(BytesIO(RpcResult(req_msg_id=1, result=Vector([1, 2, 3], Long)).write() + message.write()))
+
+    b = BytesIO(message.write())
+    Message.skip(b)
+
+    assert b.tell() == len(message.write())
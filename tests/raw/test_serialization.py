@@ -0,0 +1,107 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+
+from pyrogram import raw
+from pyrogram.raw.core import TLObject, Vector, Int, Long, Bytes, String
+
+
+def multi_media(count: int = 3) -> raw.functions.messages.SendMultiMedia:
+    return raw.functions.messages.SendMultiMedia(
+        peer=raw.types.InputPeerChannel(channel_id=1234, access_hash=5678),
+        multi_media=[
+            raw.types.InputSingleMedia(
+                media=raw.types.InputMediaUploadedDocument(
+                    file=raw.types.InputFile(id=i, parts=1, name=f"file{i}.txt", md5_checksum=""),
+                    mime_type="text/plain",
+                    attributes=[raw.types.DocumentAttributeFilename(file_name=f"file{i}.txt")]
+                ),
+                random_id=i,
+                message="caption" * i,
+                entities=[raw.types.MessageEntityBold(offset=0, length=i)]
+            )
+            for i in range(count)
+        ],
+        silent=True
+    )
+
+
+def test_write_roundtrip():
+    query = multi_media()
+    data = query.write()
+
+    assert isinstance(data, bytes)
+    assert TLObject.read(BytesIO(data)).write() == data
+
+
+def test_write_to_appends():
+    query = multi_media()
+
+    b = bytearray(b"head")
+    query.write_to(b)
+
+    assert bytes(b) == b"head" + query.write()
+    assert len(query) == len(query.write())
+
+
+def test_nested_write_matches_parts():
+    peer = raw.types.InputPeerChat(chat_id=42)
+    query = raw.functions.messages.GetHistory(
+        peer=peer, offset_id=1, offset_date=2, add_offset=3, limit=4, max_id=5, min_id=6, hash=7
+    )
+
+    assert query.write() == b"".join([
+        Int(query.ID, False),
+        Int(raw.types.InputPeerChat.ID, False), Long(42),
+        Int(1), Int(2), Int(3), Int(4), Int(5), Int(6), Long(7)
+    ])
+
+
+def test_primitives_write_to():
+    for value in [b"", b"a" * 253, b"b" * 254, b"c" * 1000]:
+        b = bytearray()
+        Bytes.write_to(b, value)
+        assert bytes(b) == Bytes(value)
+        assert Bytes.read(BytesIO(b)) == value
+
+    b = bytearray()
+    String.write_to(b, "héllo")
+    assert bytes(b) == String("héllo")
+
+    ids = [1, 2, 3]
+    b = bytearray()
+    Vector.write_to(b, ids, Int)
+    assert bytes(b) == Vector(ids, Int)
+    assert TLObject.read(BytesIO(b), Int) == ids
+
+
+def test_fixed_width_runs():
+    update = raw.types.UpdateReadChannelInbox(
+        channel_id=10, max_id=20, still_unread_count=30, pts=40, folder_id=1
+    )
+    data = update.write()
+
+    assert data == b"".join([
+        Int(update.ID, False), Int(1), Int(1), Long(10), Int(20), Int(30), Int(40)
+    ])
+
+    decoded = TLObject.read(BytesIO(data))
+
+    assert (decoded.folder_id, decoded.channel_id, decoded.max_id) == (1, 10, 20)
+    assert (decoded.still_unread_count, decoded.pts) == (30, 40)
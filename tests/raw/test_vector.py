@@ -0,0 +1,91 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import BytesIO
+
+from pyrogram import raw
+from pyrogram.raw.core import TLObject, Vector, Int, Long, RpcResult
+
+
+class CountingBytesIO(BytesIO):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def messages(count: int) -> raw.types.messages.Messages:
+    return raw.types.messages.Messages(
+        messages=[
+            raw.types.Message(
+                id=i,
+                peer_id=raw.types.PeerUser(user_id=i),
+                date=i,
+                message="hello" * (i % 10),
+                entities=[raw.types.MessageEntityBold(offset=0, length=5)] * (i % 4)
+            )
+            for i in range(count)
+        ],
+        chats=[raw.types.ChatEmpty(id=i) for i in range(count)],
+        users=[raw.types.UserEmpty(id=i) for i in range(count)]
+    )
+
+
+def test_vector_decoding_is_linear():
+    # Decoding used to copy the whole remaining buffer for each vector, making it quadratic in the payload size
+    for count in [10, 1000]:
+        data = messages(count).write()
+        b = CountingBytesIO(data)
+
+        assert TLObject.read(b).write() == data
+        assert b.bytes_read == len(data)
+
+
+def test_read_result_uses_return_type():
+    # DialogPeerFolder elements are 8 bytes long and used to be mistaken for longs
+    peers = [raw.types.DialogPeerFolder(folder_id=i) for i in range(5)]
+    query = raw.functions.messages.GetDialogUnreadMarks()
+
+    assert query.read_result(BytesIO(Vector(peers))) == peers
+
+    query = raw.functions.contacts.GetContactIDs(hash=0)
+    assert query.read_result(BytesIO(Vector([1, 2, 3], Int))) == [1, 2, 3]
+
+
+def test_read_result_unwraps_queries():
+    query = raw.functions.InvokeWithLayer(
+        layer=1,
+        query=raw.functions.InvokeWithoutUpdates(query=raw.functions.photos.DeletePhotos(id=[]))
+    )
+
+    assert query.read_result(BytesIO(Vector([1 << 40, 2], Long))) == [1 << 40, 2]
+
+
+def test_rpc_result_keeps_payload():
+    payload = Vector([1, 2], Long)
+    data = RpcResult(req_msg_id=42, result=payload).write()
+    result = TLObject.read(BytesIO(data))
+
+    assert isinstance(result, RpcResult)
+    assert result.req_msg_id == 42
+    assert result.result == payload
+    assert raw.types.RpcResult is RpcResult
@@ -0,0 +1,197 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from pyrogram.storage import FileStorage, MemoryStorage
+from pyrogram.storage.sqlite_thread import SQLiteThread
+
+
+@pytest.mark.asyncio
+async def test_session_accessors(tmp_path):
+    storage = FileStorage("test", tmp_path)
+    await storage.open()
+
+    assert await storage.dc_id() == 2
+    assert await storage.auth_key() is None
+
+    await storage.dc_id(4)
+    await storage.auth_key(b"\x01" * 256)
+    await storage.test_mode(True)
+    await storage.save()
+    await storage.close()
+
+    storage = FileStorage("test", tmp_path)
+    await storage.open()
+
+    assert await storage.dc_id() == 4
+    assert await storage.auth_key() == b"\x01" * 256
+    assert await storage.test_mode() == 1
+    assert await storage.api_id() is None
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_session_string_roundtrip():
+    storage = MemoryStorage("test")
+    await storage.open()
+
+    await storage.dc_id(1)
+    await storage.api_id(12345)
+    await storage.test_mode(False)
+    await storage.auth_key(b"\x02" * 256)
+    await storage.user_id(42)
+    await storage.is_bot(True)
+
+    session_string = await storage.export_session_string()
+
+    restored = MemoryStorage("test", session_string)
+    await restored.open()
+
+    assert await restored.export_session_string() == session_string
+    assert (await restored.user_id(), await restored.is_bot()) == (42, 1)
+
+
+@pytest.mark.asyncio
+async def test_session_reads_skip_sqlite():
+    storage = MemoryStorage("test")
+    await storage.open()
+    await storage.dc_id()
+
+    statements = []
+    storage.conn.set_trace_callback(statements.append)
+
+    for _ in range(1000):
+        await storage.dc_id()
+        await storage.auth_key()
+        await storage.test_mode()
+
+    assert statements == []
+
+    await storage.date(1)
+    assert await storage.date() == 1
+    assert [s for s in statements if s.startswith("UPDATE")] == ["UPDATE sessions SET date = 1"]
+
+
+@pytest.mark.asyncio
+async def test_file_storage_uses_dedicated_thread(tmp_path):
+    storage = FileStorage("test", tmp_path)
+    await storage.open()
+
+    threads = set()
+    await storage.run(storage.conn.set_trace_callback, lambda _: threads.add(threading.current_thread().name))
+
+    await storage.update_peers([(42, 1234, "user", "pyrogram", None)])
+    peer = await storage.get_peer_by_username("pyrogram")
+    await storage.save()
+
+    assert peer.user_id == 42
+    assert threads == {"Storage-test"}
+
+    thread = storage.thread.thread
+    await storage.close()
+
+    assert not thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_thread_stop_doesnt_block():
+    thread = SQLiteThread("test")
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    task = asyncio.ensure_future(tick())
+    sleep = asyncio.ensure_future(thread.run(time.sleep, 0.2))
+    await asyncio.sleep(0)
+
+    await thread.stop()
+    task.cancel()
+
+    assert await sleep is None
+
+    assert len(ticks) > 5
+    assert not thread.thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_peers_written_behind_when_changed():
+    storage = MemoryStorage("test")
+    storage.PEERS_FLUSH_INTERVAL = 0.01
+    await storage.open()
+
+    statements = []
+    storage.conn.set_trace_callback(statements.append)
+
+    def writes():
+        return len([s for s in statements if s.startswith("REPLACE INTO peers")])
+
+    peer = (42, 1234, "user", "pyrogram", None)
+
+    for _ in range(100):
+        await storage.update_peers([peer])
+
+    # Known right away, even if not written yet
+    assert (await storage.get_peer_by_id(42)).access_hash == 1234
+    assert writes() == 0
+
+    await asyncio.sleep(0.05)
+    assert writes() == 1
+
+    await storage.update_peers([peer])
+    await storage.update_peers([(42, 5678, "user", "pyrogram", None)])
+
+    assert (await storage.get_peer_by_username("pyrogram")).access_hash == 5678
+    assert writes() == 2
+
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_peers_flush_kept():
+    storage = MemoryStorage("test")
+    await storage.open()
+
+    commit_many = storage.commit_many
+
+    def failing(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    storage.commit_many = failing
+    await storage.update_peers([(42, 1234, "user", "pyrogram", None)])
+
+    with pytest.raises(sqlite3.OperationalError):
+        await storage.flush_peers()
+
+    storage.commit_many = commit_many
+    await storage.update_peers([(43, 5678, "user", None, None)])
+    await storage.flush_peers()
+
+    rows = await storage.run(storage.fetchall, "SELECT id FROM peers ORDER BY id")
+    assert rows == [(42,), (43,)]
+
+    await storage.close()
@@ -0,0 +1,408 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import time
+
+import pytest
+
+from pyrogram import enums, filters, metrics, raw, types
+from pyrogram.dispatcher import Dispatcher, ShardedQueue, UpdatesQueue, CommandIndex
+from pyrogram.handlers import MessageHandler, RawUpdateHandler, UserStatusHandler
+from pyrogram.methods.utilities.get_metrics import GetMetrics
+import tests.filters
+
+
+class Client:
+    def __init__(self, shards: int = None):
+        self.workers = 1
+        self.shards = shards
+        self.fan_out = None
+        self.max_queue_size = None
+        self.queue_policies = None
+        self.slow_handler_threshold = None
+        self.handler_timeout = None
+        self.metrics = metrics.Metrics()
+        self.no_updates = False
+        self.executor = None
+
+
+def new_message(peer, message_id: int) -> raw.types.UpdateNewMessage:
+    return raw.types.UpdateNewMessage(
+        message=raw.types.Message(id=message_id, peer_id=peer, date=0, message=""),
+        pts=message_id,
+        pts_count=1
+    )
+
+
+def test_sharded_queue_keeps_chat_order():
+    queue = ShardedQueue(4)
+    peers = [raw.types.PeerUser(user_id=i) for i in range(1, 9)] + [raw.types.PeerChannel(channel_id=1)]
+
+    for message_id in range(10):
+        for peer in peers:
+            queue.put_nowait((new_message(peer, message_id), {}, {}))
+
+    assert queue.qsize() == 10 * len(peers)
+    assert sum(queue.depths()) == queue.qsize()
+    assert len([depth for depth in queue.depths() if depth]) > 1
+
+    for peer in peers:
+        shard = queue.get_queue(new_message(peer, 0))
+        assert shard is queue.get_queue(raw.types.UpdateReadHistoryInbox(
+            peer=peer, max_id=0, still_unread_count=0, pts=0, pts_count=0
+        ))
+
+    for shard in queue.queues:
+        packets = [shard.get_nowait() for _ in range(shard.qsize())]
+
+        for peer in peers:
+            ids = [update.message.id for update, _, _ in packets if update.message.peer_id == peer]
+
+            assert ids in ([], list(range(10)))
+
+
+def test_sharded_queue_keys():
+    assert ShardedQueue.get_key(raw.types.UpdateUserStatus(user_id=5, status=raw.types.UserStatusEmpty())) == 5
+    assert ShardedQueue.get_key(raw.types.UpdateChannelTooLong(channel_id=1)) == -1000000000001
+    assert ShardedQueue.get_key(raw.types.UpdateConfig()) == 0
+
+
+@pytest.mark.asyncio
+async def test_routes():
+    dispatcher = Dispatcher(Client())
+
+    async def callback(*args):
+        pass
+
+    message_handler = MessageHandler(callback)
+    raw_handler = RawUpdateHandler(callback)
+    status_handler = UserStatusHandler(callback)
+
+    dispatcher.add_handler(message_handler, 1)
+    dispatcher.add_handler(raw_handler, 0)
+    dispatcher.add_handler(status_handler, 1)
+
+    assert dispatcher.routes[MessageHandler] == (((raw_handler, True),), ((message_handler, False),))
+    assert dispatcher.routes[type(None)] == (((raw_handler, True),),)
+
+    dispatcher.remove_handler(raw_handler, 0)
+
+    assert dispatcher.routes[UserStatusHandler] == (((status_handler, False),),)
+    assert dispatcher.routes[type(None)] == ()
+
+    with pytest.raises(ValueError):
+        dispatcher.remove_handler(raw_handler, 2)
+
+
+def deleted_messages(message_id: int) -> raw.types.UpdateDeleteMessages:
+    return raw.types.UpdateDeleteMessages(messages=[message_id], pts=message_id, pts_count=1)
+
+
+def user_status(user_id: int, expires: int) -> raw.types.UpdateUserStatus:
+    return raw.types.UpdateUserStatus(user_id=user_id, status=raw.types.UserStatusOffline(was_online=expires))
+
+
+@pytest.mark.asyncio
+async def test_updates_queue_drop_oldest():
+    queue = UpdatesQueue(2, {raw.types.UpdateDeleteMessages: enums.QueuePolicy.DROP_OLDEST})
+
+    for i in range(1, 5):
+        await queue.put((deleted_messages(i), {}, {}))
+
+    assert [queue.get_nowait()[0].pts for _ in range(queue.qsize())] == [3, 4]
+    assert queue.dropped == {"UpdateDeleteMessages": 2}
+
+
+@pytest.mark.asyncio
+async def test_updates_queue_keeps_blocking_updates():
+    queue = UpdatesQueue(2, Dispatcher.QUEUE_POLICIES)
+    message = new_message(raw.types.PeerUser(user_id=1), 1)
+
+    await queue.put((message, {}, {}))
+    await queue.put((user_status(1, 10), {}, {}))
+
+    # The oldest droppable update goes, not the oldest one
+    for i in range(2, 10):
+        await queue.put((user_status(i, 10), {}, {}))
+
+    assert queue.get_nowait()[0] is message
+    assert queue.get_nowait()[0].user_id == 9
+
+    # With nothing droppable queued, the incoming update goes
+    await queue.put((message, {}, {}))
+    await queue.put((message, {}, {}))
+    await queue.put((user_status(1, 20), {}, {}))
+
+    assert [queue.get_nowait()[0] for _ in range(queue.qsize())] == [message, message]
+    assert queue.dropped == {"UpdateUserStatus": 9}
+
+
+@pytest.mark.asyncio
+async def test_updates_queue_coalesce():
+    queue = UpdatesQueue(10, Dispatcher.QUEUE_POLICIES)
+
+    await queue.put((user_status(1, 10), {}, {}))
+    await queue.put((deleted_messages(1), {}, {}))
+    await queue.put((user_status(2, 20), {}, {}))
+    await queue.put((user_status(1, 30), {}, {}))
+    await queue.put((deleted_messages(2), {}, {}))
+
+    assert queue.qsize() == 3
+    assert queue.coalesced == {"UpdateUserStatus": 1, "UpdateDeleteMessages": 1}
+
+    update, users, chats = queue.get_nowait()
+    assert (update.user_id, update.status.was_online) == (1, 30)
+
+    update, users, chats = queue.get_nowait()
+    assert (update.messages, update.pts, update.pts_count) == ([1, 2], 2, 2)
+
+    # Once taken, an update can't be merged into anymore
+    await queue.put((user_status(2, 40), {}, {}))
+    await queue.put((deleted_messages(3), {}, {}))
+    assert queue.qsize() == 2
+
+
+@pytest.mark.asyncio
+async def test_updates_queue_block():
+    queue = UpdatesQueue(1)
+
+    await queue.put((deleted_messages(1), {}, {}))
+    put = asyncio.ensure_future(queue.put((deleted_messages(2), {}, {})))
+    await asyncio.sleep(0)
+
+    assert not put.done()
+
+    queue.get_nowait()
+    await put
+
+    assert queue.get_nowait()[0].pts == 2
+    assert queue.dropped == {}
+
+
+def test_command_index():
+    handlers = [MessageHandler(None, filters.command(f"cmd{i}") & filters.text) for i in range(10)]
+    handlers.insert(5, MessageHandler(None, filters.text))
+    handlers.append(MessageHandler(None, filters.command("cmd0", prefixes="!")))
+
+    index = CommandIndex(tuple((handler, False) for handler in handlers))
+    client = tests.filters.Client()
+
+    def select(text: str) -> list:
+        return [handler for handler, _ in index.select(client, tests.filters.Message(text))]
+
+    assert select("/cmd3 arg") == [handlers[3], handlers[5]]
+    assert select("/cmd7@username") == [handlers[5], handlers[8]]
+    assert select("/cmd7username") == [handlers[5], handlers[8]]
+    assert select("!cmd0") == [handlers[0], handlers[5], handlers[11]]
+    assert select("hello") == [handlers[5]]
+
+    # Filters changed after being indexed still route correctly
+    handlers[11].filters.commands = {"other"}
+    handlers[11].filters.prefixes.add("?")
+
+    assert select("!cmd0") == [handlers[0], handlers[5]]
+    assert select("?other") == [handlers[5], handlers[11]]
+
+
+@pytest.mark.asyncio
+async def test_skip_parsing():
+    dispatcher = Dispatcher(Client())
+    parsed, received = [], []
+
+    async def parser(update, users, chats):
+        parsed.append(update)
+        return update.message, MessageHandler
+
+    async def callback(client, *args):
+        received.append(args[0])
+
+    for update_type in Dispatcher.NEW_MESSAGE_UPDATES:
+        dispatcher.update_parsers[update_type] = parser
+
+    async def handle(update):
+        queue = asyncio.Queue()
+        queue.put_nowait((update, {}, {}))
+        queue.put_nowait(None)
+        await dispatcher.handler_worker(queue)
+
+    update = new_message(raw.types.PeerUser(user_id=1), 1)
+
+    dispatcher.add_handler(RawUpdateHandler(callback), 0)
+    await handle(update)
+    assert (parsed, received) == ([], [update])
+
+    dispatcher.add_handler(MessageHandler(callback), 1)
+    await handle(update)
+    assert (parsed, received) == ([update], [update, update, update.message])
+
+
+@pytest.mark.asyncio
+async def test_waiters():
+    dispatcher = Dispatcher(Client())
+    received = []
+
+    async def parser(update, users, chats):
+        message = update.message
+        return types.Message(
+            id=message.id,
+            chat=types.Chat(id=message.peer_id.user_id, type=enums.ChatType.PRIVATE),
+            from_user=types.User(id=message.peer_id.user_id),
+            text=message.message
+        ), MessageHandler
+
+    async def callback(client, message):
+        received.append(message.id)
+
+    for update_type in Dispatcher.NEW_MESSAGE_UPDATES:
+        dispatcher.update_parsers[update_type] = parser
+
+    async def handle(*updates):
+        queue = asyncio.Queue()
+
+        for update in updates:
+            queue.put_nowait((update, {}, {}))
+
+        queue.put_nowait(None)
+        await dispatcher.handler_worker(queue)
+
+    dispatcher.add_handler(MessageHandler(callback), 0)
+
+    async def after_first(_, __, message):
+        return message.id > 1
+
+    waiter = dispatcher.add_waiter(MessageHandler, 1, None, filters.create(after_first))
+    other = dispatcher.add_waiter(MessageHandler, 2, 2, None)
+
+    await handle(
+        new_message(raw.types.PeerUser(user_id=1), 1),
+        new_message(raw.types.PeerUser(user_id=3), 2),
+        new_message(raw.types.PeerUser(user_id=1), 3),
+        new_message(raw.types.PeerUser(user_id=1), 4)
+    )
+
+    assert waiter[0].result().id == 3
+    assert not other[0].done()
+    assert received == [1, 2, 4]
+    assert list(dispatcher.waiters[MessageHandler]) == [(2, 2)]
+
+    # The most specific waiter gets the update, even if made later
+    anyone = dispatcher.add_waiter(MessageHandler, None, None, None)
+    user = dispatcher.add_waiter(MessageHandler, None, 2, None)
+
+    await handle(new_message(raw.types.PeerUser(user_id=2), 5), new_message(raw.types.PeerUser(user_id=2), 6))
+
+    assert other[0].result().id == 5
+    assert user[0].result().id == 6
+    assert not anyone[0].done()
+
+    dispatcher.remove_waiter(MessageHandler, None, None, anyone)
+    assert dispatcher.waiters == {}
+
+
+@pytest.mark.asyncio
+async def test_handler_stats_and_timeout():
+    client = Client()
+    client.handler_timeout = 0.05
+    dispatcher = Dispatcher(client)
+
+    async def fast(client, *args):
+        pass
+
+    async def slow(client, *args):
+        await asyncio.sleep(1)
+
+    async def failing(client, *args):
+        raise ValueError
+
+    async def timing_out(client, *args):
+        # A timeout of the callback's own is an exception, not a handler timeout
+        await asyncio.wait_for(asyncio.sleep(1), 0.001)
+
+    handlers = [
+        RawUpdateHandler(fast),
+        RawUpdateHandler(slow),
+        RawUpdateHandler(failing),
+        RawUpdateHandler(timing_out)
+    ]
+
+    for group, handler in enumerate(handlers):
+        dispatcher.add_handler(handler, group)
+
+    queue = asyncio.Queue()
+
+    for _ in range(3):
+        queue.put_nowait((raw.types.UpdateConfig(), {}, {}))
+
+    queue.put_nowait(None)
+    await dispatcher.handler_worker(queue)
+
+    stats = dispatcher.handler_stats
+
+    assert [stats[handler]["count"] for handler in handlers] == [3, 3, 3, 3]
+    assert stats[handlers[1]]["timeouts"] == 3
+    assert 0.05 <= stats[handlers[1]]["p50"] < 1
+    assert stats[handlers[2]]["exceptions"] == 3
+    assert stats[handlers[3]]["exceptions"] == 3
+    assert stats[handlers[3]]["timeouts"] == 0
+    assert stats[handlers[0]]["p99"] < 0.05
+
+    client.dispatcher = dispatcher
+    handler_metrics = GetMetrics.get_metrics(client)["handlers"]
+
+    assert [m["callback"] for m in handler_metrics] == [handler.callback.__qualname__ for handler in handlers]
+    assert handler_metrics[1]["handler"] == "RawUpdateHandler"
+    assert handler_metrics[1]["timeouts"] == 3
+
+    dispatcher.remove_handler(handlers[0], 0)
+    assert handlers[0] not in dispatcher.handler_stats
+
+
+def test_histogram():
+    histogram = metrics.Histogram((0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.to_dict() == {"buckets": {0.1: 2, 1.0: 3, float("inf"): 4}, "count": 4, "sum": 2.65}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_metrics():
+    client = Client()
+    dispatcher = Dispatcher(client)
+
+    async def callback(client, *args):
+        pass
+
+    dispatcher.add_handler(RawUpdateHandler(callback), 0)
+
+    queue = UpdatesQueue()
+    metrics.received_at.set(time.monotonic() - 1)
+
+    for _ in range(3):
+        await queue.put((raw.types.UpdateConfig(), {}, {}))
+
+    await queue.put(None)
+    await dispatcher.handler_worker(queue)
+
+    stages = client.metrics.to_dict()
+
+    assert stages["queue"]["count"] == stages["callback"]["count"] == stages["total"]["count"] == 3
+    assert stages["total"]["sum"] >= 3
+    assert stages["parse"]["count"] == stages["filter"]["count"] == 0
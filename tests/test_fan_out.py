@@ -0,0 +1,60 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+import pytest
+
+from pyrogram import raw
+from pyrogram.fan_out import encode_packet, decode_packet, write_frame, read_frame, UPDATE
+
+
+def test_packet_round_trip():
+    update = raw.types.UpdateNewMessage(
+        message=raw.types.Message(
+            id=1, peer_id=raw.types.PeerUser(user_id=42), date=0, message="hello", from_id=raw.types.PeerUser(user_id=42)
+        ),
+        pts=10,
+        pts_count=1
+    )
+    users = {42: raw.types.User(id=42, first_name="Pyrogram", access_hash=123)}
+
+    decoded_update, decoded_users, decoded_chats = decode_packet(encode_packet(update, users, {}))
+
+    assert decoded_update.write() == update.write()
+    assert decoded_users.keys() == {42}
+    assert decoded_users[42].write() == users[42].write()
+    assert decoded_chats == {}
+
+
+@pytest.mark.asyncio
+async def test_frames():
+    reader = asyncio.StreamReader()
+
+    class Writer:
+        def write(self, data):
+            reader.feed_data(data)
+
+        async def drain(self):
+            pass
+
+    await write_frame(Writer(), asyncio.Lock(), UPDATE, b"payload")
+    reader.feed_eof()
+
+    assert await read_frame(reader) == (UPDATE, b"payload")
+    assert await read_frame(reader) is None
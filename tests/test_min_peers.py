@@ -0,0 +1,71 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+import pytest
+
+from pyrogram import Client, raw
+
+
+class FakeClient:
+    def __init__(self):
+        self.queries = []
+
+    async def resolve_peer(self, peer_id):
+        return raw.types.InputPeerChannel(channel_id=peer_id, access_hash=0)
+
+    async def invoke(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(0)
+
+        return raw.types.updates.ChannelDifference(
+            pts=0, new_messages=[], other_updates=[], chats=[],
+            users=[raw.types.User(id=query.filter.ranges[0].min_id, first_name="Pyrogram")]
+        )
+
+
+def new_channel_message(channel_id: int, message_id: int, pts: int) -> raw.types.UpdateNewChannelMessage:
+    return raw.types.UpdateNewChannelMessage(
+        message=raw.types.Message(id=message_id, peer_id=raw.types.PeerChannel(channel_id=channel_id), date=0, message=""),
+        pts=pts,
+        pts_count=1
+    )
+
+
+@pytest.mark.asyncio
+async def test_one_difference_per_channel():
+    client = FakeClient()
+    users, chats = {}, {}
+
+    updates = [
+        new_channel_message(1, 10, 100),
+        new_channel_message(2, 20, 200),
+        new_channel_message(1, 11, 101),
+        raw.types.UpdateNewChannelMessage(message=raw.types.MessageEmpty(id=12), pts=102, pts_count=1)
+    ]
+
+    await Client.fetch_min_peers(client, updates, users, chats)
+
+    assert len(client.queries) == 2
+
+    first = next(q for q in client.queries if q.channel.channel_id == -1000000000001)
+    assert [(r.min_id, r.max_id) for r in first.filter.ranges] == [(10, 10), (11, 11)]
+    assert first.pts == 99
+
+    assert set(users) == {10, 20}
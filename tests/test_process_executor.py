@@ -0,0 +1,71 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import os
+
+import pytest
+
+from pyrogram import enums, run_in_process, types
+from pyrogram.process_executor import run_callback, execute, create_executor
+
+
+@run_in_process
+def reply_pid(client, message):
+    message.reply(str(os.getpid()))
+
+
+@run_in_process
+async def send_twice(client, message):
+    await client.send_message(message.chat.id, message.text)
+    await client.send_message(message.chat.id, message.text)
+
+
+class Client:
+    def __init__(self):
+        self.loop = asyncio.get_event_loop()
+        self.process_executor = create_executor(1)
+        self.me = None
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def message(text: str = "hello") -> types.Message:
+    return types.Message(id=1, chat=types.Chat(id=42, type=enums.ChatType.PRIVATE), text=text)
+
+
+def test_run_callback():
+    actions = run_callback(send_twice, (message(),))
+
+    assert actions == [("send_message", (42, "hello"), {})] * 2
+
+
+@pytest.mark.asyncio
+async def test_execute():
+    client = Client()
+
+    try:
+        await execute(client, reply_pid, message())
+    finally:
+        client.process_executor.shutdown()
+
+    assert len(client.sent) == 1
+    assert client.sent[0][0] == 42
+    assert client.sent[0][1] != str(os.getpid())
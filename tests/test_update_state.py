@@ -0,0 +1,250 @@
+#  Pyrogram - Telegram MTProto API Client Library for Python
+#  Copyright (C) 2017-present Dan <https://github.com/delivrance>
+#
+#  This file is part of Pyrogram.
+#
+#  Pyrogram is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Pyrogram is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with Pyrogram.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+import pytest
+
+from pyrogram import raw
+from pyrogram.dispatcher import UpdatesQueue
+from pyrogram.storage import MemoryStorage
+from pyrogram.update_state import UpdateState, PTS
+
+
+class Dispatcher:
+    def __init__(self):
+        self.updates_queue = asyncio.Queue()
+
+
+class Client:
+    def __init__(self):
+        self.loop = asyncio.get_event_loop()
+        self.storage = MemoryStorage("test")
+        self.dispatcher = Dispatcher()
+        self.differences = 0
+        self.resolved = 0
+        self.me = None
+
+    async def invoke(self, query):
+        self.differences += 1
+        return raw.types.updates.DifferenceEmpty(date=0, seq=0)
+
+    async def resolve_peer(self, peer_id):
+        self.resolved += 1
+        return raw.types.InputPeerChannel(channel_id=-peer_id - 1000000000000, access_hash=0)
+
+
+def delete_messages(pts: int, count: int = 1) -> raw.types.UpdateDeleteMessages:
+    return raw.types.UpdateDeleteMessages(messages=[pts], pts=pts, pts_count=count)
+
+
+def dispatched(client: Client) -> list:
+    updates = []
+
+    while not client.dispatcher.updates_queue.empty():
+        updates.append(client.dispatcher.updates_queue.get_nowait()[0].pts)
+
+    return updates
+
+
+@pytest.mark.asyncio
+async def test_storage_roundtrip():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    await state.set_state(raw.types.updates.State(pts=10, qts=20, date=30, seq=40, unread_count=0))
+    await state.set(1234, 50)
+
+    # Writes are held back until the state is stopped or the save interval elapses
+    assert await client.storage.update_state() == []
+    await state.stop()
+
+    loaded = UpdateState(client)
+    await loaded.load()
+
+    assert (loaded.pts, loaded.qts, loaded.date, loaded.seq) == (10, 20, 30, 40)
+    assert loaded.channels == {1234: 50}
+
+
+@pytest.mark.asyncio
+async def test_in_order_and_duplicates():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+
+    await state.process(delete_messages(11), {}, {})
+    await state.process(delete_messages(13, 2), {}, {})
+    await state.process(delete_messages(12), {}, {})
+
+    assert dispatched(client) == [11, 13]
+    assert state.pts == 13
+
+
+@pytest.mark.asyncio
+async def test_gap_filled_before_timeout():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+
+    await state.process(delete_messages(12), {}, {})
+    assert dispatched(client) == []
+    assert PTS in state.gap_tasks
+
+    await state.process(delete_messages(11), {}, {})
+    assert dispatched(client) == [11, 12]
+    assert state.pts == 12
+
+    await state.stop()
+    assert client.differences == 0
+
+
+@pytest.mark.asyncio
+async def test_gap_fetches_difference():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts, state.qts, state.date = 10, 0, 0
+    state.GAP_TIMEOUT = 0
+
+    await state.process(delete_messages(12), {}, {})
+    await asyncio.sleep(0.1)
+
+    assert client.differences == 1
+    assert state.gap_tasks == {}
+    assert dispatched(client) == [12]
+
+
+@pytest.mark.asyncio
+async def test_short_message_built_locally():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+    state.cache_peers([raw.types.User(id=42, first_name="Pyrogram")])
+
+    await state.process(
+        raw.types.UpdateShortMessage(id=1, user_id=42, message="hello", pts=11, pts_count=1, date=0), {}, {}
+    )
+
+    update, users, chats = client.dispatcher.updates_queue.get_nowait()
+
+    assert isinstance(update, raw.types.UpdateNewMessage)
+    assert update.message.message == "hello"
+    assert update.message.from_id.user_id == 42
+    assert list(users) == [42]
+    assert client.differences == 0
+
+
+@pytest.mark.asyncio
+async def test_short_message_unknown_peer():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+    state.cache_peers([raw.types.User(id=42, first_name="Pyrogram")])
+
+    await state.process(
+        raw.types.UpdateShortChatMessage(
+            id=1, from_id=42, chat_id=7, message="hello", pts=11, pts_count=1, date=0
+        ),
+        {}, {}
+    )
+    await asyncio.sleep(0)
+
+    assert client.dispatcher.updates_queue.empty()
+    assert client.differences == 1
+
+
+@pytest.mark.asyncio
+async def test_affected_result_of_channel_peer():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+    state.GAP_TIMEOUT = 0
+
+    await state.process_result(
+        raw.functions.messages.UnpinAllMessages(peer=raw.types.InputPeerChannel(channel_id=99, access_hash=0)),
+        raw.types.messages.AffectedHistory(pts=500, pts_count=1, offset=0)
+    )
+    await asyncio.sleep(0.1)
+
+    assert (state.pts, state.channels) == (10, {99: 500})
+
+    await state.process(delete_messages(11), {}, {})
+    assert dispatched(client) == [11]
+
+    await state.process_result(
+        raw.functions.messages.ReadMentions(peer=raw.types.InputPeerEmpty()),
+        raw.types.messages.AffectedHistory(pts=900, pts_count=1, offset=0)
+    )
+    assert state.pts == 11
+
+    await state.stop()
+
+
+@pytest.mark.asyncio
+async def test_too_long_untracked_channel():
+    client = Client()
+    await client.storage.open()
+
+    state = UpdateState(client)
+
+    await state.process(raw.types.UpdateChannelTooLong(channel_id=99), {}, {})
+    assert state.channels == {} and state.gap_tasks == {}
+
+    # Gaps of channels no longer tracked are dropped without resolving them
+    await state.get_channel_difference(98)
+    assert client.resolved == 0 and client.differences == 0
+
+    await state.process(raw.types.UpdateChannelTooLong(channel_id=99, pts=50), {}, {})
+    assert state.channels == {99: 50} and 99 in state.gap_tasks
+
+    await state.stop()
+
+
+@pytest.mark.asyncio
+async def test_result_with_full_queue():
+    client = Client()
+    client.dispatcher.updates_queue = UpdatesQueue(1)
+    await client.storage.open()
+
+    state = UpdateState(client)
+    state.pts = 10
+
+    await state.process(delete_messages(12), {}, {})
+    client.dispatcher.updates_queue.put_nowait((delete_messages(1), {}, {}))
+
+    # A handler invokes a method whose result fills the gap while the queue is full and no worker is getting from it
+    result = raw.types.messages.AffectedMessages(pts=11, pts_count=1)
+    await asyncio.wait_for(state.process_result(raw.functions.messages.DeleteMessages(id=[11]), result), 1)
+
+    assert state.pts == 12
+    assert dispatched(client) == [1]
+
+    await asyncio.sleep(0.01)
+    assert dispatched(client) == [12]